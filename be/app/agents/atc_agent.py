@@ -7,12 +7,21 @@ import re
 from datetime import datetime
 from typing import Dict, List, Any, Optional
 from groq import Groq
-from uagents import Agent, Context, Protocol, Model
-from uagents.setup import fund_agent_if_low
 from ..utils.logging import get_logger
 
 logger = get_logger(__name__)
 
+# Transcript normalization and callsign patterns, compiled once at import
+_RIDE_DASH_RE = re.compile(r'\b(\d+)-ride\b')
+_RIDE_PAIR_RE = re.compile(r'\b(\d)(\d)\s*ride\b')
+_RUNWAY_RE = re.compile(r'\brunway\s*(\d+)')
+_LINE_UP_WAIT_RE = re.compile(r'\bline\s*up\s*and\s*wait\b')
+_CONTACT_DEPARTURE_RE = re.compile(r'\bcontact\s*departure\b')
+_TAKEOFF_RE = re.compile(r'\btake\s*off\b')
+_DIRECT_CALLSIGN_RE = re.compile(r'\b([A-Z]{2,3})(\d{1,4})\b', re.IGNORECASE)
+_JSON_FENCE_START_RE = re.compile(r'^```json\s*')
+_JSON_FENCE_END_RE = re.compile(r'\s*```$')
+
 
 class ATCAgent:
     """Modern ATC language processing agent"""
@@ -39,6 +48,14 @@ class ATCAgent:
             "jetblue": "JBU", "alaska": "ASA", "spirit": "NKS", "frontier": "FFT"
         }
         
+        # Single-pass alternations built from the tables above
+        self._phonetic_re = re.compile(
+            r'\b(' + '|'.join(map(re.escape, self.phonetic_numbers)) + r')\b'
+        )
+        self._airline_callsign_re = re.compile(
+            r'\b(' + '|'.join(map(re.escape, self.common_airlines)) + r')\s+(\d+)\s*(heavy)?\b'
+        )
+        
         logger.info(f"Initialized ATC Agent with model: {model}")
     
     async def process_transcript(self, transcript: str, frequency: str = "unknown") -> Dict[str, Any]:
@@ -92,20 +109,19 @@ class ATCAgent:
         text = transcript.lower().strip()
         
         # Fix common ATC phonetic issues
-        for phonetic, digit in self.phonetic_numbers.items():
-            text = re.sub(rf'\b{phonetic}\b', digit, text)
+        text = self._phonetic_re.sub(lambda m: self.phonetic_numbers[m.group(1)], text)
         
         # Fix common number patterns
-        text = re.sub(r'\b(\d+)-ride\b', r'\1\1', text)
-        text = re.sub(r'\b(\d)(\d)\s*ride\b', r'\1\1', text)
+        text = _RIDE_DASH_RE.sub(r'\1\1', text)
+        text = _RIDE_PAIR_RE.sub(r'\1\1', text)
         
         # Fix runway patterns
-        text = re.sub(r'\brunway\s*(\d+)', r'runway \1', text)
+        text = _RUNWAY_RE.sub(r'runway \1', text)
         
         # Fix common phrases
-        text = re.sub(r'\bline\s*up\s*and\s*wait\b', 'line up and wait', text)
-        text = re.sub(r'\bcontact\s*departure\b', 'contact departure', text)
-        text = re.sub(r'\btake\s*off\b', 'takeoff', text)
+        text = _LINE_UP_WAIT_RE.sub('line up and wait', text)
+        text = _CONTACT_DEPARTURE_RE.sub('contact departure', text)
+        text = _TAKEOFF_RE.sub('takeoff', text)
         
         return text
     
@@ -174,8 +190,8 @@ Return ONLY the JSON object, no other text.
             
             # Clean up the response if it has markdown formatting
             if json_text.startswith("```"):
-                json_text = re.sub(r'^```json\s*', '', json_text)
-                json_text = re.sub(r'\s*```$', '', json_text)
+                json_text = _JSON_FENCE_START_RE.sub('', json_text)
+                json_text = _JSON_FENCE_END_RE.sub('', json_text)
             
             return json.loads(json_text)
             
@@ -225,8 +241,7 @@ Return ONLY the JSON object, no other text.
         callsigns = []
         
         # Pattern for airline + number
-        airline_pattern = r'\b(united|american|delta|southwest|jetblue|alaska|spirit|frontier)\s+(\d+)\s*(heavy)?\b'
-        matches = re.findall(airline_pattern, transcript.lower())
+        matches = self._airline_callsign_re.findall(transcript.lower())
         
         for airline, number, heavy in matches:
             airline_code = self.common_airlines.get(airline, airline.upper())
@@ -236,13 +251,10 @@ Return ONLY the JSON object, no other text.
             callsigns.append(callsign)
         
         # Pattern for direct callsigns
-        direct_pattern = r'\b([A-Z]{2,3})(\d{1,4})\b'
-        matches = re.findall(direct_pattern, transcript.upper())
-        
-        for airline_code, number in matches:
-            callsigns.append(f"{airline_code}{number}")
+        for airline_code, number in _DIRECT_CALLSIGN_RE.findall(transcript):
+            callsigns.append(f"{airline_code.upper()}{number}")
         
-        return list(set(callsigns))
+        return list(dict.fromkeys(callsigns))
     
     def get_stats(self) -> Dict[str, Any]:
         """Get processing statistics"""
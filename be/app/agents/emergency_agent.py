@@ -8,6 +8,9 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# How often processed_message_ids is trimmed back to the ids still in messages.json
+PRUNE_INTERVAL_SECONDS = 60
+
 class EmergencyDetectionAgent:
     """
     Agent that monitors messages.json for emergencies, alerts, and warnings.
@@ -18,6 +21,7 @@ class EmergencyDetectionAgent:
         self.messages_file = messages_file
         self.emergencies_file = emergencies_file
         self.processed_message_ids = set()
+        self._last_prune = time.monotonic()
         self.last_check_time = datetime.now()
         
         # Initialize Groq client
@@ -175,6 +179,13 @@ class EmergencyDetectionAgent:
                         
                     # Mark as processed
                     self.processed_message_ids.add(message_id)
+            
+            # messages.json only keeps the newest entries, so ids that have rotated
+            # out can never be seen again; expire them periodically to keep the set bounded
+            now = time.monotonic()
+            if now - self._last_prune >= PRUNE_INTERVAL_SECONDS:
+                self.processed_message_ids &= {message.get('id') for message in messages}
+                self._last_prune = now
                     
             # Save updated emergencies
             if new_emergencies_count > 0:
@@ -215,13 +226,12 @@ class EmergencyDetectionAgent:
         """Update emergency status"""
         emergencies = self._load_emergencies()
         
-        for emergency in emergencies:
-            if emergency.get('id') == emergency_id:
-                emergency['status'] = status
-                if acknowledged is not None:
-                    emergency['acknowledged'] = acknowledged
-                emergency['updated_at'] = datetime.now().isoformat()
-                break
+        emergency = next((e for e in emergencies if e.get('id') == emergency_id), None)
+        if emergency is not None:
+            emergency['status'] = status
+            if acknowledged is not None:
+                emergency['acknowledged'] = acknowledged
+            emergency['updated_at'] = datetime.now().isoformat()
                 
         self._save_emergencies(emergencies)
 
@@ -1,12 +1,22 @@
-import json
 import os
+import orjson
+import re
 import time
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 import logging
 
+# One Aho-Corasick pass finds every keyword at once; the per-group regexes cover installs without it
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
 logger = logging.getLogger(__name__)
 
+# How often processed_message_ids is trimmed back to the ids still in messages.json
+PRUNE_INTERVAL_SECONDS = 60
+
 class SimpleEmergencyDetectionAgent:
     """
     Simple rule-based emergency detection agent that doesn't require LLM.
@@ -17,6 +27,13 @@ class SimpleEmergencyDetectionAgent:
         self.messages_file = messages_file
         self.emergencies_file = emergencies_file
         self.processed_message_ids = set()
+        self._last_prune = time.monotonic()
+        # (mtime_ns, size) of messages.json at the last scan; unchanged means nothing new
+        self._messages_stat = None
+        # Parsed emergencies.json, reused until the file changes (the frontend rewrites it
+        # to acknowledge/resolve entries, which changes its stat)
+        self._emergencies_cache: Optional[List[Dict[str, Any]]] = None
+        self._emergencies_stat = None
         
         # Emergency detection rules
         self.emergency_keywords = {
@@ -36,18 +53,58 @@ class SimpleEmergencyDetectionAgent:
             'other': ['emergency', 'mayday', 'pan-pan']
         }
         
+        # One compiled alternation per severity level / type, so each check is a single scan
+        self._severity_patterns = [
+            (sev_level, re.compile('|'.join(map(re.escape, keywords))))
+            for sev_level, keywords in self.emergency_keywords.items()
+        ]
+        self._type_patterns = [
+            (etype, re.compile('|'.join(map(re.escape, keywords))))
+            for etype, keywords in self.emergency_types.items()
+        ]
+        self._keyword_automaton = self._build_keyword_automaton() if ahocorasick else None
+        
         # Load existing emergencies
         self._load_existing_emergencies()
         
+    def _build_keyword_automaton(self):
+        """Compile every keyword into one automaton mapping it to its severity levels and types"""
+        groups: Dict[str, tuple] = {}
+        for sev_level, keywords in self.emergency_keywords.items():
+            for keyword in keywords:
+                groups.setdefault(keyword, (set(), set()))[0].add(sev_level)
+        for etype, keywords in self.emergency_types.items():
+            for keyword in keywords:
+                groups.setdefault(keyword, (set(), set()))[1].add(etype)
+        
+        automaton = ahocorasick.Automaton()
+        for keyword, (sev_levels, etypes) in groups.items():
+            automaton.add_word(keyword, (frozenset(sev_levels), frozenset(etypes)))
+        automaton.make_automaton()
+        return automaton
+    
+    def _match_keywords(self, text: str) -> tuple:
+        """Severity levels and emergency types with at least one keyword in text"""
+        if self._keyword_automaton is None:
+            return (
+                {sev_level for sev_level, pattern in self._severity_patterns if pattern.search(text)},
+                {etype for etype, pattern in self._type_patterns if pattern.search(text)}
+            )
+        
+        # Overlapping matches are all reported, e.g. both "medical emergency" and "emergency"
+        sev_levels, etypes = set(), set()
+        for _, (keyword_levels, keyword_types) in self._keyword_automaton.iter(text):
+            sev_levels |= keyword_levels
+            etypes |= keyword_types
+        return sev_levels, etypes
+    
     def _load_existing_emergencies(self):
         """Load existing emergencies file to avoid reprocessing"""
         try:
             if os.path.exists(self.emergencies_file):
-                with open(self.emergencies_file, 'r') as f:
-                    existing_emergencies = json.load(f)
-                    for emergency in existing_emergencies:
-                        if 'source_message_id' in emergency:
-                            self.processed_message_ids.add(emergency['source_message_id'])
+                for emergency in self._load_emergencies():
+                    if 'source_message_id' in emergency:
+                        self.processed_message_ids.add(emergency['source_message_id'])
                 logger.info(f"Loaded {len(self.processed_message_ids)} previously processed messages")
         except Exception as e:
             logger.error(f"Error loading existing emergencies: {e}")
@@ -72,21 +129,19 @@ class SimpleEmergencyDetectionAgent:
         emergency_type = 'other'
         confidence = 0.1
         
+        matched_levels, matched_types = self._match_keywords(text_to_analyze)
+        
         # Check for emergency keywords
-        for sev_level, keywords in self.emergency_keywords.items():
-            for keyword in keywords:
-                if keyword in text_to_analyze:
-                    severity = sev_level
-                    category = 'EMERGENCY' if sev_level in ['CRITICAL', 'HIGH'] else 'ALERT' if sev_level == 'MEDIUM' else 'WARNING'
-                    confidence = max(confidence, 0.9 if sev_level == 'CRITICAL' else 0.8 if sev_level == 'HIGH' else 0.6)
-                    break
+        for sev_level in self.emergency_keywords:
+            if sev_level in matched_levels:
+                severity = sev_level
+                category = 'EMERGENCY' if sev_level in ['CRITICAL', 'HIGH'] else 'ALERT' if sev_level == 'MEDIUM' else 'WARNING'
+                confidence = max(confidence, 0.9 if sev_level == 'CRITICAL' else 0.8 if sev_level == 'HIGH' else 0.6)
                     
         # Detect emergency type
-        for etype, keywords in self.emergency_types.items():
-            for keyword in keywords:
-                if keyword in text_to_analyze:
-                    emergency_type = etype
-                    break
+        for etype in self.emergency_types:
+            if etype in matched_types:
+                emergency_type = etype
                     
         # Boost confidence if marked urgent or has emergency flag
         if is_urgent or has_emergency_in_atc:
@@ -152,21 +207,38 @@ class SimpleEmergencyDetectionAgent:
             "created_by": "simple_emergency_agent"
         }
         
+    def _file_stat(self) -> Optional[tuple]:
+        try:
+            stat = os.stat(self.emergencies_file)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+        
     def _save_emergencies(self, emergencies: List[Dict[str, Any]]):
         """Save emergencies to JSON file"""
         try:
-            with open(self.emergencies_file, 'w') as f:
-                json.dump(emergencies, f, indent=2)
+            with open(self.emergencies_file, 'wb') as f:
+                f.write(orjson.dumps(emergencies, option=orjson.OPT_INDENT_2))
+            self._emergencies_cache = emergencies
+            self._emergencies_stat = self._file_stat()
             logger.info(f"Saved {len(emergencies)} emergencies to {self.emergencies_file}")
         except Exception as e:
+            # Callers append to the cached list before saving; drop it so the next load rereads disk
+            self._emergencies_cache = None
+            self._emergencies_stat = None
             logger.error(f"Error saving emergencies: {e}")
             
     def _load_emergencies(self) -> List[Dict[str, Any]]:
         """Load existing emergencies"""
         try:
-            if os.path.exists(self.emergencies_file):
-                with open(self.emergencies_file, 'r') as f:
-                    return json.load(f)
+            stat = self._file_stat()
+            if stat is None:
+                return []
+            if stat != self._emergencies_stat:
+                with open(self.emergencies_file, 'rb') as f:
+                    self._emergencies_cache = orjson.loads(f.read())
+                self._emergencies_stat = stat
+            return self._emergencies_cache
         except Exception as e:
             logger.error(f"Error loading emergencies: {e}")
         return []
@@ -178,11 +250,18 @@ class SimpleEmergencyDetectionAgent:
                 logger.warning(f"Messages file {self.messages_file} not found")
                 return 0
                 
-            with open(self.messages_file, 'r') as f:
-                messages = json.load(f)
+            # The file is rewritten on every new message, so an unchanged stat means no new messages
+            stat = os.stat(self.messages_file)
+            messages_stat = (stat.st_mtime_ns, stat.st_size)
+            if messages_stat == self._messages_stat:
+                return 0
+                
+            with open(self.messages_file, 'rb') as f:
+                messages = orjson.loads(f.read())
+            self._messages_stat = messages_stat
                 
             new_emergencies_count = 0
-            existing_emergencies = self._load_emergencies()
+            existing_emergencies = None
             
             # Process only new messages
             for message in messages:
@@ -195,6 +274,8 @@ class SimpleEmergencyDetectionAgent:
                     if analysis and analysis.get('has_emergency', False):
                         # Create emergency entry
                         emergency_entry = self._create_emergency_entry(message, analysis)
+                        if existing_emergencies is None:
+                            existing_emergencies = self._load_emergencies()
                         existing_emergencies.append(emergency_entry)
                         new_emergencies_count += 1
                         
@@ -202,6 +283,13 @@ class SimpleEmergencyDetectionAgent:
                         
                     # Mark as processed
                     self.processed_message_ids.add(message_id)
+            
+            # messages.json only keeps the newest entries, so ids that have rotated
+            # out can never be seen again; expire them periodically to keep the set bounded
+            now = time.monotonic()
+            if now - self._last_prune >= PRUNE_INTERVAL_SECONDS:
+                self.processed_message_ids &= {message.get('id') for message in messages}
+                self._last_prune = now
                     
             # Save updated emergencies
             if new_emergencies_count > 0:
@@ -2,17 +2,35 @@
 VAPI Voice Agent - Make calls to existing assistants with dynamic data
 """
 import asyncio
-import json
+import random
+import orjson
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Dict, Any, Optional
 import httpx
 from ..utils.logging import get_logger
-from uagents import Agent, Context, Protocol, Model
-from uagents.setup import fund_agent_if_low
-#Fetch AI
 
 logger = get_logger(__name__)
 
+# Throttling and gateway errors are worth another try; 4xx like 400/401 fail fast
+VAPI_RETRY_ATTEMPTS = 4
+# Rate limiting and "unavailable" are the only statuses where VAPI refused the call
+# before placing it; a 500/502/504 may arrive after the phone is already dialing
+VAPI_RETRY_STATUSES = frozenset({429, 503})
+VAPI_MAX_RETRY_DELAY = 8.0
+# Only failures where the request never reached VAPI; retrying a read timeout could place the call twice
+_VAPI_TRANSIENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def _retry_delay(attempt: int, response: Optional[httpx.Response] = None) -> float:
+    """Capped exponential backoff with jitter, deferring to Retry-After when the server sends one"""
+    if response is not None:
+        retry_after = response.headers.get("Retry-After", "")
+        try:
+            return min(float(retry_after), VAPI_MAX_RETRY_DELAY)
+        except ValueError:
+            pass
+    return min(0.5 * 2 ** attempt, VAPI_MAX_RETRY_DELAY) + random.random() * 0.25
+
 
 class VAPIVoiceAgent:
     """Agent for making voice calls via VAPI with dynamic data"""
@@ -31,8 +49,45 @@ class VAPIVoiceAgent:
             "start_time": datetime.now()
         }
         
+        # One pooled HTTP/2 client for the agent's lifetime so repeated and
+        # concurrent calls reuse keep-alive connections instead of each
+        # paying TCP and TLS setup
+        self.client = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=10, max_connections=20),
+            timeout=30.0
+        )
+        
         logger.info("Initialized VAPI Voice Agent")
     
+    async def _post_with_retry(self, url: str, content: bytes, timeout: float) -> httpx.Response:
+        """POST to VAPI, retrying connection failures and retryable statuses"""
+        for attempt in range(VAPI_RETRY_ATTEMPTS):
+            last_attempt = attempt == VAPI_RETRY_ATTEMPTS - 1
+            try:
+                response = await self.client.post(url, headers=self.headers, content=content, timeout=timeout)
+            except _VAPI_TRANSIENT_ERRORS as e:
+                if last_attempt:
+                    raise
+                delay = _retry_delay(attempt)
+                logger.warning(f"VAPI request failed ({e}), retrying in {delay:.2f}s")
+            else:
+                if response.status_code not in VAPI_RETRY_STATUSES or last_attempt:
+                    return response
+                delay = _retry_delay(attempt, response)
+                logger.warning(f"VAPI returned {response.status_code}, retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+    
+    async def aclose(self):
+        """Close the pooled HTTP client"""
+        await self.client.aclose()
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+    
     async def make_emergency_call(
         self,
         assistant_id: str,
@@ -54,6 +109,10 @@ class VAPIVoiceAgent:
         Returns:
             Call response data including call ID and status
         """
+        # One clock read per call, shared by the payload and every result path
+        now = datetime.now()
+        timestamp = now.isoformat()
+        
         try:
             self.stats["calls_initiated"] += 1
             
@@ -63,13 +122,13 @@ class VAPIVoiceAgent:
                 "customer": {
                     "number": phone_number
                 },
-                "name": call_name or f"Emergency Call - {datetime.now().strftime('%Y%m%d_%H%M%S')}",
+                "name": call_name or f"Emergency Call - {now.strftime('%Y%m%d_%H%M%S')}",
                 "assistantOverrides": {
                     "variableValues": {
-                        "emergency_data": json.dumps(emergency_data),
+                        "emergency_data": orjson.dumps(emergency_data).decode(),
                         "emergency_type": emergency_data.get("emergency_type", emergency_data.get("type", "unknown")),
                         "airport_code": emergency_data.get("airport_code", ""),
-                        "timestamp": emergency_data.get("timestamp", datetime.now().isoformat()),
+                        "timestamp": emergency_data.get("timestamp", timestamp),
                         "urgency_level": emergency_data.get("urgency_level", "medium"),
                         "location": emergency_data.get("location", emergency_data.get("details", {}).get("location", "")),
                         "reported_by": emergency_data.get("reported_by", emergency_data.get("details", {}).get("reported_by", "ATC System"))
@@ -82,31 +141,30 @@ class VAPIVoiceAgent:
                 call_payload["phoneNumberId"] = phone_number_id
             
             # Make the API call
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/call",
-                    headers=self.headers,
-                    json=call_payload,
-                    timeout=30.0
-                )
-                
-                response.raise_for_status()
-                result = response.json()
-                
-                self.stats["calls_completed"] += 1
-                
-                logger.info(f"Successfully initiated VAPI call: {result.get('id')}")
-                logger.info(f"Call status: {result.get('status')}")
-                
-                return {
-                    "success": True,
-                    "call_id": result.get("id"),
-                    "status": result.get("status"),
-                    "call_data": result,
-                    "emergency_data": emergency_data,
-                    "timestamp": datetime.now().isoformat()
-                }
-                
+            response = await self._post_with_retry(
+                f"{self.base_url}/call",
+                # Pre-encoded with orjson; self.headers already sets Content-Type
+                content=orjson.dumps(call_payload),
+                timeout=30.0
+            )
+            
+            response.raise_for_status()
+            result = response.json()
+            
+            self.stats["calls_completed"] += 1
+            
+            logger.info(f"Successfully initiated VAPI call: {result.get('id')}")
+            logger.info(f"Call status: {result.get('status')}")
+            
+            return {
+                "success": True,
+                "call_id": result.get("id"),
+                "status": result.get("status"),
+                "call_data": result,
+                "emergency_data": emergency_data,
+                "timestamp": timestamp
+            }
+            
         except httpx.HTTPStatusError as e:
             self.stats["calls_failed"] += 1
             error_msg = f"VAPI API error: {e.response.status_code} - {e.response.text}"
@@ -117,7 +175,7 @@ class VAPIVoiceAgent:
                 "error": error_msg,
                 "status_code": e.response.status_code,
                 "emergency_data": emergency_data,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": timestamp
             }
             
         except Exception as e:
@@ -129,7 +187,7 @@ class VAPIVoiceAgent:
                 "success": False,
                 "error": error_msg,
                 "emergency_data": emergency_data,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": timestamp
             }
     
     async def make_airport_emergency_call(
@@ -208,16 +266,15 @@ class VAPIVoiceAgent:
         Get the status of a specific call
         """
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/call/{call_id}",
-                    headers=self.headers,
-                    timeout=10.0
-                )
-                
-                response.raise_for_status()
-                return response.json()
-                
+            response = await self.client.get(
+                f"{self.base_url}/call/{call_id}",
+                headers=self.headers,
+                timeout=10.0
+            )
+            
+            response.raise_for_status()
+            return response.json()
+            
         except Exception as e:
             logger.error(f"Error getting call status: {e}")
             return {"error": str(e)}
@@ -227,16 +284,15 @@ class VAPIVoiceAgent:
         List available VAPI assistants
         """
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/assistant",
-                    headers=self.headers,
-                    timeout=10.0
-                )
-                
-                response.raise_for_status()
-                return response.json()
-                
+            response = await self.client.get(
+                f"{self.base_url}/assistant",
+                headers=self.headers,
+                timeout=10.0
+            )
+            
+            response.raise_for_status()
+            return response.json()
+            
         except Exception as e:
             logger.error(f"Error listing assistants: {e}")
             return {"error": str(e)}
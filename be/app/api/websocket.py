@@ -1,8 +1,10 @@
 """
 WebSocket API endpoints for real-time communication
 """
+import asyncio
 import json
-from typing import List, Dict, Any
+import orjson
+from typing import Set, Dict, Any
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from datetime import datetime
 
@@ -17,7 +19,7 @@ class ConnectionManager:
     """Manages WebSocket connections"""
     
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
+        self.active_connections: Set[WebSocket] = set()
         self.stats = {
             "total_connections": 0,
             "active_connections": 0,
@@ -27,22 +29,24 @@ class ConnectionManager:
     async def connect(self, websocket: WebSocket):
         """Accept and track new connection"""
         await websocket.accept()
-        self.active_connections.append(websocket)
+        self.active_connections.add(websocket)
         self.stats["total_connections"] += 1
         self.stats["active_connections"] = len(self.active_connections)
         logger.info(f"New WebSocket connection. Total active: {len(self.active_connections)}")
     
     def disconnect(self, websocket: WebSocket):
         """Remove disconnected client"""
-        if websocket in self.active_connections:
+        try:
             self.active_connections.remove(websocket)
-            self.stats["active_connections"] = len(self.active_connections)
-            logger.info(f"WebSocket disconnected. Total active: {len(self.active_connections)}")
+        except KeyError:
+            return
+        self.stats["active_connections"] = len(self.active_connections)
+        logger.info(f"WebSocket disconnected. Total active: {len(self.active_connections)}")
     
     async def send_message(self, websocket: WebSocket, message: Dict[str, Any]):
         """Send message to specific client"""
         try:
-            await websocket.send_text(json.dumps(message))
+            await websocket.send_text(orjson.dumps(message).decode())
             self.stats["messages_sent"] += 1
         except Exception as e:
             logger.error(f"Error sending message to client: {e}")
@@ -56,18 +60,23 @@ class ConnectionManager:
         # Add timestamp to message
         message["broadcast_timestamp"] = datetime.now().isoformat()
         
-        disconnected = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(json.dumps(message))
-                self.stats["messages_sent"] += 1
-            except Exception as e:
-                logger.error(f"Error broadcasting to client: {e}")
-                disconnected.append(connection)
+        # Serialize once for all clients
+        message_json = orjson.dumps(message).decode()
+        
+        # Send to every client concurrently so one slow socket doesn't delay the rest
+        connections = tuple(self.active_connections)
+        results = await asyncio.gather(
+            *(connection.send_text(message_json) for connection in connections),
+            return_exceptions=True
+        )
         
-        # Remove disconnected clients
-        for connection in disconnected:
-            self.disconnect(connection)
+        # Count deliveries and drop failed clients straight from the snapshot
+        for connection, result in zip(connections, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error broadcasting to client: {result}")
+                self.disconnect(connection)
+            else:
+                self.stats["messages_sent"] += 1
     
     def get_stats(self) -> Dict[str, Any]:
         """Get connection statistics"""
@@ -70,6 +70,9 @@ class ATCModelSelector:
             "fallback_used": 0,
             "avg_latency_ms": 0
         }
+        # Running totals so the average is updated in O(1) per request
+        self._latency_total_ms = 0.0
+        self._latency_count = 0
         
         logger.info(f"ATC Model Selector initialized - ATC optimization: {use_atc_optimization}")
         
@@ -99,6 +102,12 @@ class ATCModelSelector:
         self.model_stats["fallback_used"] += 1
         return ATC_MODEL_CONFIGS[ModelType.STANDARD], "standard_processing"
     
+    def record_latency(self, latency_ms: float):
+        """Fold one completed request's latency into the running average"""
+        self._latency_total_ms += latency_ms
+        self._latency_count += 1
+        self.model_stats["avg_latency_ms"] = round(self._latency_total_ms / self._latency_count, 2)
+    
     def get_model_performance_estimate(self, model_type: ModelType) -> Dict[str, Any]:
         """Get performance estimates for a model type"""
         config = ATC_MODEL_CONFIGS[model_type]
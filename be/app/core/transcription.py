@@ -3,6 +3,7 @@ Transcription service using Groq Whisper with ATC optimization
 """
 import asyncio
 import base64
+import time
 import httpx
 from typing import Optional
 
@@ -57,6 +58,7 @@ class TranscriptionService:
                 "sample_rate": sample_rate
             }
 
+            start = time.perf_counter()
             async with httpx.AsyncClient() as client:
                 response = await client.post(
                     self.agent_address,
@@ -64,6 +66,7 @@ class TranscriptionService:
                     timeout=30.0
                 )
                 response.raise_for_status()
+            self.atc_selector.record_latency((time.perf_counter() - start) * 1000)
 
             response_data = response.json()
             transcript = response_data.get("transcript")
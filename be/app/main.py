@@ -3,10 +3,13 @@ Main FastAPI application for ATC Audio Agent - Full Version
 """
 import asyncio
 import json
+import orjson
 import os
+import re
 import shutil
 import sys
 from contextlib import asynccontextmanager
+from itertools import takewhile
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from typing import List, Dict, Any
@@ -42,6 +45,24 @@ background_task = None
 MESSAGES_FILE = "../messages.json"
 MAX_MESSAGES = 100
 
+# Transcript filter tables, built once rather than on every call
+_PUNCTUATION_TABLE = str.maketrans('', '', '.,!?')
+
+_MEANINGLESS_PHRASES = frozenset({
+    'thank you', 'thanks', 'yes', 'no', 'okay', 'ok', 'roger', 'copy', 
+    'uh', 'um', 'ah', 'eh', 'and', 'the', 'a', 'an', 'is', 'are', 'was', 'were'
+})
+
+_AVIATION_KEYWORDS = frozenset({
+    'runway', 'tower', 'ground', 'taxi', 'takeoff', 'landing', 'cleared', 'contact', 
+    'frequency', 'squawk', 'heading', 'altitude', 'descend', 'climb', 'turn', 'left', 'right',
+    'bravo', 'alpha', 'charlie', 'delta', 'echo', 'foxtrot', 'golf', 'hotel', 'india',
+    'aircraft', 'flight', 'heavy', 'super', 'traffic', 'approach', 'departure'
+})
+
+# Keywords that flag a non-urgent message as notable in the Letta chat summary
+_NOTABLE_KEYWORDS_RE = re.compile(r'emergency|mayday|priority|medical', re.IGNORECASE)
+
 logger = get_logger(__name__)
 
 
@@ -63,8 +84,8 @@ def load_messages() -> List[Dict[str, Any]]:
     """Load messages from JSON file"""
     try:
         if os.path.exists(MESSAGES_FILE):
-            with open(MESSAGES_FILE, 'r') as f:
-                return json.load(f)
+            with open(MESSAGES_FILE, 'rb') as f:
+                return orjson.loads(f.read())
         return []
     except Exception as e:
         logger.error(f"❌ Error loading messages: {e}")
@@ -74,8 +95,8 @@ def load_messages() -> List[Dict[str, Any]]:
 def save_messages(messages: List[Dict[str, Any]]):
     """Save messages to JSON file"""
     try:
-        with open(MESSAGES_FILE, 'w') as f:
-            json.dump(messages, f, indent=2)
+        with open(MESSAGES_FILE, 'wb') as f:
+            f.write(orjson.dumps(messages, option=orjson.OPT_INDENT_2))
         
         # Also copy to frontend public folder for web access
         shutil.copy(MESSAGES_FILE, "../fe/public/messages.json")
@@ -89,19 +110,14 @@ def is_meaningful_transcript(transcript: str) -> bool:
         return False
     
     # Remove common punctuation and whitespace
-    cleaned = transcript.strip().lower().replace('.', '').replace(',', '').replace('!', '').replace('?', '')
+    cleaned = transcript.strip().lower().translate(_PUNCTUATION_TABLE)
     
     # Filter out single characters, dots, and very short meaningless phrases
     if len(cleaned) <= 1:
         return False
     
     # Filter out common meaningless phrases
-    meaningless_phrases = {
-        'thank you', 'thanks', 'yes', 'no', 'okay', 'ok', 'roger', 'copy', 
-        'uh', 'um', 'ah', 'eh', 'and', 'the', 'a', 'an', 'is', 'are', 'was', 'were'
-    }
-    
-    if cleaned in meaningless_phrases:
+    if cleaned in _MEANINGLESS_PHRASES:
         return False
     
     # Must have at least 2 words to be meaningful
@@ -109,21 +125,35 @@ def is_meaningful_transcript(transcript: str) -> bool:
     if len(words) < 2:
         return False
     
-    # Check if it contains aviation-related keywords
-    aviation_keywords = {
-        'runway', 'tower', 'ground', 'taxi', 'takeoff', 'landing', 'cleared', 'contact', 
-        'frequency', 'squawk', 'heading', 'altitude', 'descend', 'climb', 'turn', 'left', 'right',
-        'bravo', 'alpha', 'charlie', 'delta', 'echo', 'foxtrot', 'golf', 'hotel', 'india',
-        'aircraft', 'flight', 'heavy', 'super', 'traffic', 'approach', 'departure'
-    }
-    
     # If it contains aviation keywords or has callsign pattern, it's meaningful
-    has_aviation_keyword = any(keyword in cleaned for keyword in aviation_keywords)
+    has_aviation_keyword = any(keyword in cleaned for keyword in _AVIATION_KEYWORDS)
     has_callsign_pattern = any(word for word in words if len(word) >= 2 and (word.isalnum() or any(c.isdigit() for c in word)))
     
     return has_aviation_keyword or has_callsign_pattern or len(words) >= 4
 
 
+def _extract_field(items: List[Any], key: str) -> List[str]:
+    """Pull `key` out of each analysis item; the LLM sometimes returns bare strings instead of objects"""
+    values = []
+    append = values.append
+    for item in items:
+        if type(item) is dict:
+            append(item.get(key, ''))
+        elif type(item) is str:
+            append(item)
+    return values
+
+
+# Strong references to in-flight live Letta updates so they are not collected early
+_letta_tasks = set()
+
+
+def _on_letta_update_done(task: asyncio.Task):
+    _letta_tasks.discard(task)
+    if not task.cancelled() and task.exception():
+        logger.debug(f"⚠️ Could not auto-update Letta: {task.exception()}")
+
+
 def add_message(transcript: str, atc_data: Dict[str, Any], chunk_number: int):
     """Add a new message to the JSON file"""
     
@@ -133,18 +163,19 @@ def add_message(transcript: str, atc_data: Dict[str, Any], chunk_number: int):
         return None
     
     # Extract callsigns
-    callsigns = atc_data.get('callsigns', [])
-    primary_callsign = callsigns[0].get('callsign', 'KSFO Tower') if callsigns else 'KSFO Tower'
+    callsigns = _extract_field(atc_data.get('callsigns', []), 'callsign')
+    primary_callsign = callsigns[0] if callsigns and callsigns[0] else 'KSFO Tower'
     
+    now = datetime.now()
     message = {
         "id": str(uuid.uuid4()),
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": now.isoformat(),
         "callsign": primary_callsign,
         "message": transcript,
         "isUrgent": atc_data.get('emergencies', False) or 'mayday' in transcript.lower() or 'emergency' in transcript.lower(),
         "type": "atc_analysis",
         "rawTranscript": transcript,
-        "instructions": [inst.get('type', '') for inst in atc_data.get('instructions', [])],
+        "instructions": _extract_field(atc_data.get('instructions', []), 'type'),
         "runways": atc_data.get('runways', []),
         "chunk": chunk_number,
         "atc_data": atc_data
@@ -172,7 +203,7 @@ def add_message(transcript: str, atc_data: Dict[str, Any], chunk_number: int):
             if agent:
                 # Create a real-time update for Letta
                 update_message = f"""
-📡 **LIVE ATC UPDATE** - {datetime.now().strftime('%H:%M:%S')}
+📡 **LIVE ATC UPDATE** - {now.strftime('%H:%M:%S')}
 
 **Callsign**: {primary_callsign}
 **Message**: {transcript}
@@ -183,18 +214,11 @@ def add_message(transcript: str, atc_data: Dict[str, Any], chunk_number: int):
 This is a live update from the ATC communications system. Please incorporate this information into your ongoing shift awareness.
 """
                 
-                from letta_service import MessageCreate, TextContent
-                agent.client.agents.messages.create(
-                    agent_id=agent.agent_id,
-                    messages=[MessageCreate(
-                        role="user",
-                        content=[TextContent(
-                            type="text",
-                            text=update_message
-                        )]
-                    )]
-                )
-                logger.info(f"🤖 Auto-updated Letta with new message: {primary_callsign}")
+                # Post in the background so storing the message never waits on Letta
+                task = asyncio.get_running_loop().create_task(agent.send_message(update_message))
+                _letta_tasks.add(task)
+                task.add_done_callback(_on_letta_update_done)
+                logger.info(f"🤖 Queued Letta update for new message: {primary_callsign}")
     except Exception as e:
         logger.debug(f"⚠️ Could not auto-update Letta: {e}")
     
@@ -241,7 +265,7 @@ async def lifespan(app: FastAPI):
     # Initialize Letta agent if API key is configured
     if hasattr(settings, 'letta_api_key') and settings.letta_api_key and init_letta_agent:
         try:
-            init_letta_agent(settings.letta_api_key)
+            await init_letta_agent(settings.letta_api_key)
             logger.info("✅ Letta Shift Agent initialized")
         except Exception as e:
             logger.error(f"❌ Failed to initialize Letta agent: {e}")
@@ -303,6 +327,9 @@ async def lifespan(app: FastAPI):
     if audio_processor:
         audio_processor.stop()
     
+    if vapi_agent:
+        await vapi_agent.aclose()
+    
     logger.info("ATC Audio Agent stopped")
 
 
@@ -318,7 +345,7 @@ async def start_audio_processing(settings):
                 if agent:
                     logger.info("🤖 Auto-loading existing ATC data into Letta...")
                     comprehensive_data = agent.load_comprehensive_data(MESSAGES_FILE)
-                    agent.update_comprehensive_memory(comprehensive_data)
+                    await agent.update_comprehensive_memory(comprehensive_data)
                     logger.info(f"✅ Loaded {comprehensive_data.get('total_messages', 0)} existing messages into Letta")
         except Exception as e:
             logger.debug(f"⚠️ Could not auto-load data into Letta: {e}")
@@ -402,17 +429,8 @@ async def start_audio_processing(settings):
 This is an automated shift status update to keep you current with ongoing operations.
 """
                             
-                            from letta_service import MessageCreate, TextContent
-                            agent.client.agents.messages.create(
-                                agent_id=agent.agent_id,
-                                messages=[MessageCreate(
-                                    role="user",
-                                    content=[TextContent(
-                                        type="text",
-                                        text=summary_update
-                                    )]
-                                )]
-                            )
+                            await agent.send_message(summary_update)
+                            await agent.flush_notes()
                             logger.info("✅ Completed periodic Letta update")
                 except Exception as e:
                     logger.debug(f"⚠️ Periodic Letta update failed: {e}")
@@ -478,10 +496,11 @@ async def get_messages(limit: int = 50, since: str = None):
     if since:
         try:
             since_dt = datetime.fromisoformat(since.replace('Z', '+00:00'))
-            filtered_messages = [
-                msg for msg in messages 
-                if datetime.fromisoformat(msg['timestamp'].replace('Z', '+00:00')) > since_dt
-            ]
+            # Messages are stored newest-first, so stop at the first one that isn't newer
+            filtered_messages = list(takewhile(
+                lambda msg: datetime.fromisoformat(msg['timestamp'].replace('Z', '+00:00')) > since_dt,
+                messages
+            ))
         except ValueError:
             filtered_messages = messages
     else:
@@ -503,13 +522,10 @@ async def get_active_callsigns():
     """Get list of unique callsigns from recent messages"""
     messages = load_messages()
     
-    callsigns = set()
-    for msg in messages:
-        if msg.get('callsign') and msg['callsign'] != 'SYSTEM':
-            callsigns.add(msg['callsign'])
+    callsigns = {msg['callsign'] for msg in messages if msg.get('callsign') and msg['callsign'] != 'SYSTEM'}
     
     return {
-        "callsigns": sorted(list(callsigns)),
+        "callsigns": sorted(callsigns),
         "count": len(callsigns),
         "timestamp": datetime.now().isoformat()
     }
@@ -691,6 +707,7 @@ async def process_emergency_data_for_vapi(data: dict):
     emergency_type = data.get("emergency_type", "Unknown Emergency")
     location = data.get("location", "Unknown Location")
     details = data.get("details", "No additional details")
+    now = datetime.now()
     
     # Format emergency message
     emergency_message = f"""
@@ -698,7 +715,7 @@ async def process_emergency_data_for_vapi(data: dict):
     Aircraft: {aircraft_id}
     Location: {location}
     Details: {details}
-    Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S UTC')}
+    Time: {now.strftime('%Y-%m-%d %H:%M:%S UTC')}
     
     This is an automated emergency notification from the ATC Audio Agent system.
     Please respond immediately and coordinate with airport emergency services.
@@ -712,7 +729,7 @@ async def process_emergency_data_for_vapi(data: dict):
             "location": location,
             "details": details,
             "emergency_message": emergency_message,
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": now.isoformat(),
             "priority": "high"
         },
         "call_data": {
@@ -736,7 +753,7 @@ async def initialize_letta_agent(data: dict):
         raise HTTPException(status_code=400, detail="api_key is required")
     
     try:
-        init_letta_agent(api_key)
+        await init_letta_agent(api_key)
         return {"status": "success", "message": "Letta agent initialized"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to initialize Letta agent: {str(e)}")
@@ -754,7 +771,7 @@ async def load_todays_events():
     
     try:
         events = agent.load_todays_messages(MESSAGES_FILE)
-        agent.update_agent_memory(events)
+        await agent.update_agent_memory(events)
         
         return {
             "status": "success", 
@@ -790,7 +807,7 @@ async def add_manual_note(data: dict):
     
     try:
         agent.add_manual_note(note, category)
-        return {"status": "success", "message": "Note added to agent memory"}
+        return {"status": "success", "message": "Note queued for agent memory"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to add note: {str(e)}")
 
@@ -806,8 +823,9 @@ async def get_shift_summary(shift_type: str = "handover"):
         raise HTTPException(status_code=503, detail="Letta agent not initialized")
     
     try:
-        summary = agent.generate_shift_summary(shift_type)
-        patterns = agent.get_shift_patterns()
+        # Both prompts go to the same stateful agent conversation, so one at a time
+        summary = await agent.generate_shift_summary(shift_type)
+        patterns = await agent.get_shift_patterns()
         
         return {
             "summary": summary,
@@ -830,7 +848,7 @@ async def get_shift_patterns():
         raise HTTPException(status_code=503, detail="Letta agent not initialized")
     
     try:
-        patterns = agent.get_shift_patterns()
+        patterns = await agent.get_shift_patterns()
         return patterns
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get patterns: {str(e)}")
@@ -869,7 +887,7 @@ async def load_comprehensive_data():
     
     try:
         comprehensive_data = agent.load_comprehensive_data(MESSAGES_FILE)
-        agent.update_comprehensive_memory(comprehensive_data)
+        await agent.update_comprehensive_memory(comprehensive_data)
         
         return {
             "status": "success",
@@ -899,8 +917,9 @@ async def get_markdown_summary(shift_type: str = "handover", include_weather: bo
         raise HTTPException(status_code=503, detail="Letta agent not initialized")
     
     try:
-        markdown_summary = agent.generate_markdown_summary(shift_type, include_weather)
-        patterns = agent.get_shift_patterns()
+        # Both prompts go to the same stateful agent conversation, so one at a time
+        markdown_summary = await agent.generate_markdown_summary(shift_type, include_weather)
+        patterns = await agent.get_shift_patterns()
         
         return {
             "summary": markdown_summary,
@@ -973,13 +992,10 @@ async def chat_with_letta(data: dict):
             
             # Count urgent messages and active callsigns
             urgent_count = sum(1 for msg in recent_messages if msg.get('isUrgent', False))
-            active_callsigns = list(set(msg.get('callsign', '') for msg in recent_messages if msg.get('callsign') and msg.get('callsign') != 'SYSTEM'))
+            active_callsigns = list(dict.fromkeys(msg['callsign'] for msg in recent_messages if msg.get('callsign') and msg['callsign'] != 'SYSTEM'))
             
-            # Get unique runway activity
-            runway_activity = list(set())
-            for msg in recent_messages:
-                runway_activity.extend(msg.get('runways', []))
-            runway_activity = list(set(runway_activity))
+            # Get unique runway activity, most recent first
+            runway_activity = list(dict.fromkeys(rwy for msg in recent_messages for rwy in msg.get('runways', [])))
             
             summary_prompt = f"""
 👋 Hello! I'm your left agent for shift assistance. Let me start by giving you a summary of recent events:
@@ -998,7 +1014,7 @@ async def chat_with_letta(data: dict):
             for msg in recent_messages[:10]:
                 if msg.get('isUrgent', False):
                     notable_events.append(f"⚠️ {msg.get('callsign', 'Unknown')}: {msg.get('message', '')[:50]}...")
-                elif any(keyword in msg.get('message', '').lower() for keyword in ['emergency', 'mayday', 'priority', 'medical']):
+                elif _NOTABLE_KEYWORDS_RE.search(msg.get('message', '')):
                     notable_events.append(f"🚨 {msg.get('callsign', 'Unknown')}: {msg.get('message', '')[:50]}...")
             
             if notable_events:
@@ -1015,18 +1031,9 @@ async def chat_with_letta(data: dict):
                 # Prepend summary to user's actual message
                 message = f"{summary_prompt}\n\n**User Question**: {message}"
         
-        # Send message to Letta agent
-        from letta_service import MessageCreate, TextContent
-        response = agent.client.agents.messages.create(
-            agent_id=agent.agent_id,
-            messages=[MessageCreate(
-                role="user",
-                content=[TextContent(
-                    type="text",
-                    text=message
-                )]
-            )]
-        )
+        # Send message to Letta agent, after any manual notes it hasn't seen yet
+        await agent.flush_notes()
+        response = await agent.send_message(message)
         
         # Extract response content
         response_text = ""
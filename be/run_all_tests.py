@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""
+Run the standalone test scripts in one process
+Imports, .env loading and the event loop are set up once instead of per script
+"""
+import asyncio
+
+from test_phraseology_formatter import test_garbled_transcripts
+from test_semantic_cache import test_signatures
+from test_simple_emergency import main as test_simple_emergency
+from test_dispatch import test_dispatch_system, test_api_integration
+from src.event_loop import install_uvloop
+
+async def run_all():
+    """Run each suite in turn on a single event loop"""
+    # Suites run one after another so their console output stays readable
+    test_signatures()
+    await test_garbled_transcripts()
+    # Rule-based detection is synchronous file work; keep it off the loop
+    await asyncio.to_thread(test_simple_emergency)
+    await test_dispatch_system()
+    test_api_integration()
+
+if __name__ == "__main__":
+    install_uvloop()
+    
+    asyncio.run(run_all())
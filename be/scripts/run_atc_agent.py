@@ -24,6 +24,7 @@ load_dotenv(PROJECT_ROOT / '.env')
 
 from src.atc_audio_agent.core.audio_processor import AudioProcessor
 from src.atc_audio_agent.agents.atc_language_agent import ATCTranscriptProcessor
+from src.event_loop import install_uvloop
 
 # Setup logging
 logging.basicConfig(
@@ -196,6 +197,7 @@ class ATCAudioSystem:
             # Close WebSocket server
             websocket_server.close()
             await websocket_server.wait_closed()
+            await self.audio_processor.aclose()
 
 async def main():
     """Main entry point"""
@@ -210,4 +212,6 @@ async def main():
 
 if __name__ == "__main__":
     logger.info("🎧 ATC Audio System Starting...")
+    install_uvloop()
+    
     asyncio.run(main()) 
\ No newline at end of file
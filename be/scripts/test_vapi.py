@@ -10,6 +10,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from app.agents.vapi_voice_agent import VAPIVoiceAgent
+from src.event_loop import install_uvloop
 
 async def test_vapi():
     """Test VAPI connection"""
@@ -37,4 +38,6 @@ async def test_vapi():
         print(f"  {i+1}. {assistant.get('name', 'Unnamed')} (ID: {assistant.get('id', 'N/A')})")
 
 if __name__ == "__main__":
+    install_uvloop()
+    
     asyncio.run(test_vapi()) 
\ No newline at end of file
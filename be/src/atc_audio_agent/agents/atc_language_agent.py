@@ -4,16 +4,120 @@ ATC Language Processing Agent
 Understands aviation terminology and extracts structured data from ATC transcriptions
 """
 import asyncio
+import copy
+import hashlib
 import logging
 import json
 import re
 import os
+import threading
+from collections import OrderedDict, deque
 from datetime import datetime
+from itertools import islice
 from typing import Dict, List, Any, Optional
 from groq import Groq
 
+# Semantic caching of near-duplicate phrases is optional; exact-match caching always works
+try:
+    import numpy as np
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    np = None
+    SentenceTransformer = None
+
 logger = logging.getLogger(__name__)
 
+SEMANTIC_CACHE_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Transcript cleanup patterns, compiled once rather than per message
+_DOUBLED_DIGIT_RE = re.compile(r'\b(\d+)-ride\b')
+_SPACED_DOUBLED_DIGIT_RE = re.compile(r'\b(\d)(\d)\s*ride\b')
+_RUNWAY_RE = re.compile(r'\brunway\s*(\d+)')
+_LINE_UP_RE = re.compile(r'\bline\s*up\s*and\s*wait\b')
+_CONTACT_DEPARTURE_RE = re.compile(r'\bcontact\s*departure\b')
+_TAKEOFF_RE = re.compile(r'\btake\s*off\b')
+
+
+def _normalize_transcript(text: str) -> str:
+    """Lowercase and collapse whitespace in one pass; shared by preprocessing and cache keys"""
+    return " ".join(text.lower().split())
+
+# Disfluencies and courtesies that carry no clearance content; readbacks like
+# "roger"/"wilco" are kept because they change what the formatter produces
+_FILLER_RE = re.compile(r"\b(?:uh|um|er|ah|good day|good evening|good morning|thank you|thanks)\b")
+_SPOKEN_DIGITS = {
+    "zero": "0", "one": "1", "two": "2", "tree": "3", "three": "3", "four": "4",
+    "fife": "5", "five": "5", "six": "6", "seven": "7", "eight": "8", "niner": "9", "nine": "9"
+}
+_DIGIT_WORD_RE = re.compile(r"\b(?:" + "|".join(_SPOKEN_DIGITS) + r")\b")
+_SIDE_WORDS = {"left": "l", "right": "r", "center": "c"}
+# Words that decide what a transmission means; a semantic hit must agree on all of them.
+# Each pattern maps its spellings/inflections to one token ("clear land" == "cleared to land")
+_INSTRUCTION_PATTERNS = {
+    "land": r"land\w*",
+    "takeoff": r"take\s*-?\s*off\w*|departure\s+roll",
+    "holdshort": r"hold\w*\s+short",
+    "hold": r"hold\w*",
+    "cross": r"cross\w*",
+    "lineup": r"line\s*up",
+    "contact": r"contact\w*",
+    "taxi": r"taxi\w*",
+    "goaround": r"go\s*-?\s*around",
+    "cancel": r"cancel\w*",
+    "expect": r"expect\w*",
+    "continue": r"continu\w*",
+    "climb": r"climb\w*",
+    "descend": r"descen\w*",
+    "maintain": r"maintain\w*",
+    "turn": r"turn\w*",
+    "heading": r"heading",
+    "squawk": r"squawk\w*",
+    "behind": r"behind",
+    "follow": r"follow\w*",
+    "ground": r"ground",
+    "tower": r"tower",
+    "departure": r"departure",
+    "approach": r"approach",
+    "mayday": r"mayday",
+    "panpan": r"pan\s*-?\s*pan",
+    "emergency": r"emergenc\w*",
+}
+# Negations and units change a clearance while barely changing its wording
+# ("do not cross" vs "cross", "two thousand" vs "two hundred"), so they must agree too
+_MODIFIER_PATTERNS = {
+    "not": r"not|don'?t|cannot|can'?t|never|no",
+    "negative": r"negative",
+    "unable": r"unable",
+    "hundred": r"hundred",
+    "thousand": r"thousand",
+    "flightlevel": r"flight\s+level|fl",
+    "feet": r"feet|ft",
+    "knots": r"knots?|kts",
+    "miles": r"miles?",
+    "degrees": r"degrees?",
+}
+# Phonetic alphabet for GA callsigns and taxiways ("taxi via alpha" vs "via bravo")
+_PHONETIC_LETTERS = (
+    "alpha", "alfa", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel", "india",
+    "juliet", "juliett", "kilo", "lima", "mike", "november", "oscar", "papa", "quebec", "romeo",
+    "sierra", "tango", "uniform", "victor", "whiskey", "xray", "x-ray", "yankee", "zulu"
+)
+
+
+_EMBEDDERS: Dict[str, Any] = {}
+_EMBEDDER_LOCK = threading.Lock()
+
+
+def _load_embedder(model_name: str):
+    """Load a sentence-transformer once per process, even when concurrent lookups race for it"""
+    model = _EMBEDDERS.get(model_name)
+    if model is None:
+        with _EMBEDDER_LOCK:
+            model = _EMBEDDERS.get(model_name)
+            if model is None:
+                model = _EMBEDDERS[model_name] = SentenceTransformer(model_name)
+    return model
+
 class ATCPhraseologyFormatter:
     """
     Prompt Engineer Layer: Cleans up garbled Whisper transcriptions 
@@ -29,7 +133,7 @@ class ATCPhraseologyFormatter:
             "start_time": datetime.now()
         }
         
-        logger.info(f"Initialized ATC Phraseology Formatter with model: {model}")
+        logger.info("Initialized ATC Phraseology Formatter with model: %s", model)
     
     async def format_transcript(self, raw_transcript: str, frequency: str = "unknown") -> Dict[str, Any]:
         """
@@ -221,6 +325,7 @@ class ATCLanguageAgent:
             "four": "4", "fife": "5", "five": "5", "six": "6", "seven": "7", 
             "eight": "8", "niner": "9", "nine": "9"
         }
+        self._phonetic_re = re.compile(r'\b(?:' + '|'.join(self.phonetic_numbers) + r')\b')
         
         self.common_airlines = {
             # North American Carriers
@@ -250,7 +355,10 @@ class ATCLanguageAgent:
             "air premia": "APZ", "flair": "FLE", "frenchbee": "BF", "frontier": "FFT"
         }
         
-        logger.info(f"Initialized ATC Language Agent with model: {model}")
+        # Known ICAO codes, used to reject noise like "PM" or "ID" in direct callsign matches
+        self.valid_icao_codes = frozenset(self.common_airlines.values())
+        
+        logger.info("Initialized ATC Language Agent with model: %s", model)
     
     async def process_transcript(self, transcript: str, frequency: str = "unknown") -> Dict[str, Any]:
         """
@@ -284,8 +392,8 @@ class ATCLanguageAgent:
                 "processing_agent": "ATC_Language_Agent"
             })
             
-            logger.info(f"Processed ATC transcript: {len(enhanced_data.get('callsigns', []))} callsigns, "
-                       f"{len(enhanced_data.get('instructions', []))} instructions")
+            logger.info("Processed ATC transcript: %s callsigns, %s instructions",
+                        len(enhanced_data.get('callsigns', [])), len(enhanced_data.get('instructions', [])))
             
             return enhanced_data
             
@@ -301,23 +409,22 @@ class ATCLanguageAgent:
     def _preprocess_transcript(self, transcript: str) -> str:
         """Clean and normalize ATC transcript text"""
         # Convert to lowercase for processing
-        text = transcript.lower().strip()
+        text = _normalize_transcript(transcript)
         
-        # Fix common ATC phonetic issues
-        for phonetic, digit in self.phonetic_numbers.items():
-            text = re.sub(rf'\b{phonetic}\b', digit, text)
+        # Fix common ATC phonetic issues, all words in a single scan
+        text = self._phonetic_re.sub(lambda m: self.phonetic_numbers[m.group(0)], text)
         
         # Fix common number patterns
-        text = re.sub(r'\b(\d+)-ride\b', r'\1\1', text)  # "2-ride" -> "22"
-        text = re.sub(r'\b(\d)(\d)\s*ride\b', r'\1\1', text)  # "2 2 ride" -> "22"
+        text = _DOUBLED_DIGIT_RE.sub(r'\1\1', text)  # "2-ride" -> "22"
+        text = _SPACED_DOUBLED_DIGIT_RE.sub(r'\1\1', text)  # "2 2 ride" -> "22"
         
         # Fix runway patterns
-        text = re.sub(r'\brunway\s*(\d+)', r'runway \1', text)
+        text = _RUNWAY_RE.sub(r'runway \1', text)
         
         # Fix common phrases
-        text = re.sub(r'\bline\s*up\s*and\s*wait\b', 'line up and wait', text)
-        text = re.sub(r'\bcontact\s*departure\b', 'contact departure', text)
-        text = re.sub(r'\btake\s*off\b', 'takeoff', text)
+        text = _LINE_UP_RE.sub('line up and wait', text)
+        text = _CONTACT_DEPARTURE_RE.sub('contact departure', text)
+        text = _TAKEOFF_RE.sub('takeoff', text)
         
         return text
     
@@ -509,15 +616,12 @@ Return ONLY the JSON object, no other text.
         enhanced = data.copy()
         
         # Extract additional patterns that might be missed
-        additional_callsigns = self._extract_additional_callsigns(transcript)
-        if additional_callsigns:
-            existing_callsigns = {cs.get("callsign", "") for cs in enhanced.get("callsigns", [])}
-            for callsign in additional_callsigns:
-                if callsign not in existing_callsigns:
-                    enhanced.setdefault("callsigns", []).append({
-                        "callsign": callsign,
-                        "source": "regex_extraction"
-                    })
+        seen = {cs.get("callsign", "") for cs in enhanced.get("callsigns", [])}
+        for callsign in self._extract_additional_callsigns(transcript, seen):
+            enhanced.setdefault("callsigns", []).append({
+                "callsign": callsign,
+                "source": "regex_extraction"
+            })
         
         # Add processing metadata
         enhanced["processing_stats"] = {
@@ -529,29 +633,43 @@ Return ONLY the JSON object, no other text.
         
         return enhanced
     
-    def _extract_additional_callsigns(self, transcript: str) -> List[str]:
-        """Extract additional callsigns using regex patterns"""
+    def _extract_additional_callsigns(self, transcript: str, seen: Optional[set] = None) -> List[str]:
+        """
+        Extract additional callsigns using regex patterns
+        
+        Args:
+            transcript: Cleaned transcript text
+            seen: Callsigns already known; updated in place as new ones are found
+            
+        Returns:
+            Newly found callsigns, in order of appearance
+        """
+        if seen is None:
+            seen = set()
         callsigns = []
         
         # Pattern for airline + number (e.g., "United 297", "American 1234")
         airline_pattern = r'\b(united|american|delta|southwest|jetblue|alaska|spirit|frontier)\s+(\d+)\s*(heavy)?\b'
-        matches = re.findall(airline_pattern, transcript.lower())
-        
-        for airline, number, heavy in matches:
+        for airline, number, heavy in re.findall(airline_pattern, transcript.lower()):
             airline_code = self.common_airlines.get(airline, airline.upper())
             callsign = f"{airline_code}{number}"
             if heavy:
                 callsign += " Heavy"
-            callsigns.append(callsign)
+            if callsign not in seen:
+                seen.add(callsign)
+                callsigns.append(callsign)
         
         # Pattern for direct callsigns (e.g., "UAL297", "AAL1234")
         direct_pattern = r'\b([A-Z]{2,3})(\d{1,4})\b'
-        matches = re.findall(direct_pattern, transcript.upper())
-        
-        for airline_code, number in matches:
-            callsigns.append(f"{airline_code}{number}")
+        for airline_code, number in re.findall(direct_pattern, transcript.upper()):
+            if airline_code not in self.valid_icao_codes:
+                continue
+            callsign = f"{airline_code}{number}"
+            if callsign not in seen:
+                seen.add(callsign)
+                callsigns.append(callsign)
         
-        return list(set(callsigns))  # Remove duplicates
+        return callsigns
     
     def get_stats(self) -> Dict[str, Any]:
         """Get processing statistics"""
@@ -567,14 +685,128 @@ Return ONLY the JSON object, no other text.
             )
         }
 
+class SemanticTranscriptCache:
+    """
+    Near-duplicate lookup for transcripts that differ only in wording,
+    e.g. "runway two three cleared to land" vs "runway 23 clear land".
+    Entries only match when their numbers, letters, runway sides, instructions,
+    negations, units, facilities and airline words are identical, so a
+    similar-sounding clearance for another runway, flight, altitude or
+    instruction is never reused.
+    """
+    
+    def __init__(self, threshold: float = 0.90, max_size: int = 512, top_k: int = 5,
+                 model_name: str = SEMANTIC_CACHE_MODEL, callsign_words=()):
+        # Longest phrases first so "air canada" wins over "air"
+        words = sorted({*callsign_words, *_PHONETIC_LETTERS}, key=len, reverse=True)
+        instructions = "|".join(
+            f"(?P<i_{token}>{pattern})"
+            for token, pattern in {**_INSTRUCTION_PATTERNS, **_MODIFIER_PATTERNS}.items()
+        )
+        self._signature_re = re.compile(
+            r"(?P<digit>\d)"
+            r"|\b(?P<side>left|right|center)\b"
+            rf"|\b(?P<word>{'|'.join(map(re.escape, words))})\b"
+            rf"|\b(?:{instructions})\b"
+            # Any other word directly before a number, e.g. an unlisted airline ("skywest 297")
+            r"|\b(?P<word_before_number>[a-z]+)(?=\s+\d)"
+            # Lone letters, including runway suffixes glued to digits ("28l")
+            r"|(?<![a-z])(?P<letter>[a-z])\b"
+        )
+        self.threshold = threshold
+        self.max_size = max_size
+        self.top_k = top_k
+        self.model_name = model_name
+        self._embeddings = None  # (max_size, dim) ring buffer of L2-normalized vectors
+        self._entries: List[Optional[tuple]] = [None] * max_size
+        self._size = 0
+        self._next = 0
+    
+    @staticmethod
+    def canonicalize(text: str) -> str:
+        """Lowercase, map spoken digits and drop filler so paraphrases embed alike"""
+        text = _FILLER_RE.sub(" ", text.lower())
+        text = _DIGIT_WORD_RE.sub(lambda m: _SPOKEN_DIGITS[m.group(0)], text)
+        return " ".join(text.split())
+    
+    def signature(self, canonical: str) -> str:
+        """Meaning-bearing tokens in order - these must match exactly for a hit"""
+        parts = []
+        for match in self._signature_re.finditer(canonical):
+            kind = match.lastgroup
+            if kind in ("digit", "letter"):
+                # Digits run together so "2 3" and "23" agree
+                parts.append(match.group(kind))
+            elif kind == "side":
+                parts.append(_SIDE_WORDS[match.group(kind)])
+            elif kind in ("word", "word_before_number"):
+                parts.append(f" {match.group(kind).replace(' ', '_')} ")
+            else:
+                parts.append(f" {kind[2:]} ")
+        return "".join(parts)
+    
+    async def warm_up(self):
+        """Load the embedding model ahead of the first lookup"""
+        await asyncio.to_thread(_load_embedder, self.model_name)
+    
+    def _embed(self, canonical: str):
+        model = _load_embedder(self.model_name)
+        return model.encode(canonical, normalize_embeddings=True).astype(np.float32)
+    
+    async def lookup(self, text: str, frequency: str = "unknown") -> tuple:
+        """Return (cached value or None, key to pass to insert)"""
+        canonical = self.canonicalize(text)
+        query = await asyncio.to_thread(self._embed, canonical)
+        key = (f"{frequency}|{self.signature(canonical)}", query)
+        if not self._size:
+            return None, key
+        
+        # Inner product of normalized vectors is cosine similarity
+        scores = self._embeddings[:self._size] @ query
+        k = min(self.top_k, self._size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        for idx in top[np.argsort(-scores[top])]:
+            if scores[idx] < self.threshold:
+                break
+            signature, value = self._entries[idx]
+            if signature == key[0]:
+                return value, key
+        return None, key
+    
+    def insert(self, key: tuple, value: Any):
+        signature, vector = key
+        if self._embeddings is None:
+            self._embeddings = np.zeros((self.max_size, vector.shape[0]), dtype=np.float32)
+        # Oldest entry is overwritten once full
+        self._embeddings[self._next] = vector
+        self._entries[self._next] = (signature, value)
+        self._next = (self._next + 1) % self.max_size
+        self._size = min(self._size + 1, self.max_size)
+
 # Integration with audio pipeline
 class ATCTranscriptProcessor:
     """Processes audio transcripts through the ATC Phraseology Formatter and Language Agent"""
     
-    def __init__(self, groq_api_key: str):
+    def __init__(self, groq_api_key: str, max_history: int = 1000, max_cache_size: int = 512,
+                 semantic_threshold: Optional[float] = 0.90):
         self.phraseology_formatter = ATCPhraseologyFormatter(groq_api_key)
         self.atc_agent = ATCLanguageAgent(groq_api_key)
-        self.processed_data = []
+        # Bounded history: the oldest results are evicted as new ones arrive
+        self.processed_data = deque(maxlen=max_history)
+        self.total_processed = 0
+        # Exact-match LRU of formatter/agent output, keyed by normalized text
+        self._cache = OrderedDict()
+        self.max_cache_size = max_cache_size
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # Paraphrase matching needs sentence-transformers; pass semantic_threshold=None to disable
+        self._semantic_cache = None
+        self.semantic_hits = 0
+        if semantic_threshold is not None and SentenceTransformer is not None:
+            self._semantic_cache = SemanticTranscriptCache(
+                semantic_threshold, max_cache_size,
+                callsign_words=self.atc_agent.common_airlines
+            )
         
         logger.info("Initialized ATC processing pipeline: Formatter → Language Agent")
         
@@ -588,24 +820,45 @@ class ATCTranscriptProcessor:
             if not raw_text.strip():
                 return {"error": "Empty transcript", "original": transcript_data}
             
-            logger.info(f"🎯 Processing: '{raw_text}'")
+            logger.info("🎯 Processing: '%s'", raw_text)
             
-            # Step 1: Format/clean the raw transcript 
-            logger.info("📝 Formatting with ATC Phraseology Formatter...")
-            formatting_result = await self.phraseology_formatter.format_transcript(raw_text, frequency)
-            
-            formatted_text = formatting_result.get("formatted", raw_text)
-            
-            # Log what the formatter did
-            if formatting_result.get("changes_made"):
-                logger.info(f"✨ Formatter corrections: {formatting_result['changes_made']}")
-                logger.info(f"📞 Formatted: '{formatted_text}'")
+            # Identical phrases ("roger wilco") skip both LLM calls; timestamp,
+            # chunk and other volatile metadata are not part of the key
+            cache_key = self._cache_key(raw_text, frequency)
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                self._cache.move_to_end(cache_key)
+                self.cache_hits += 1
+                # Copies, so a caller editing its result can't change what later hits return
+                formatting_result, structured_data = copy.deepcopy(cached)
+                logger.info("⚡ Cache hit, skipping formatter and language agent")
             else:
-                logger.info("✅ No formatting changes needed")
-            
-            # Step 2: Process the formatted transcript with ATC Language Agent
-            logger.info("🤖 Analyzing with ATC Language Agent...")
-            structured_data = await self.atc_agent.process_transcript(formatted_text, frequency)
+                semantic_key = None
+                if self._semantic_cache is not None:
+                    try:
+                        cached, semantic_key = await self._semantic_cache.lookup(raw_text, frequency)
+                    except Exception as e:
+                        # e.g. the embedding model can't be downloaded; keep exact-match caching only
+                        logger.warning("Semantic cache disabled: %s", e)
+                        self._semantic_cache = None
+                
+                if cached is not None:
+                    self.cache_hits += 1
+                    self.semantic_hits += 1
+                    formatting_result, structured_data = copy.deepcopy(cached)
+                    logger.info("⚡ Semantic cache hit, skipping formatter and language agent")
+                else:
+                    self.cache_misses += 1
+                    formatting_result, structured_data = await self._run_pipeline(raw_text, frequency)
+                
+                if "error" not in formatting_result and "error" not in structured_data:
+                    # Cached entries are private copies; the result below keeps the originals
+                    entry = copy.deepcopy((formatting_result, structured_data))
+                    if semantic_key is not None and cached is None:
+                        self._semantic_cache.insert(semantic_key, entry)
+                    self._cache[cache_key] = entry
+                    if len(self._cache) > self.max_cache_size:
+                        self._cache.popitem(last=False)
             
             # Combine all results
             result = {
@@ -613,17 +866,19 @@ class ATCTranscriptProcessor:
                 "formatting": formatting_result,  # Formatter results
                 "atc_analysis": structured_data,   # Language agent results
                 "processed_at": datetime.now().isoformat(),
-                "pipeline_version": "formatter_v1"
+                "pipeline_version": "formatter_v1",
+                "cached": cached is not None
             }
             
             # Store for analysis
             self.processed_data.append(result)
+            self.total_processed += 1
             
             # Log final results
-            if "callsigns" in structured_data:
+            if "callsigns" in structured_data and logger.isEnabledFor(logging.INFO):
                 callsigns = [cs.get("callsign", "Unknown") for cs in structured_data.get("callsigns", [])]
                 instructions = len(structured_data.get("instructions", []))
-                logger.info(f"🛩️  Final Analysis - Callsigns: {callsigns}, Instructions: {instructions}")
+                logger.info("🛩️  Final Analysis - Callsigns: %s, Instructions: %s", callsigns, instructions)
             
             return result
             
@@ -631,9 +886,44 @@ class ATCTranscriptProcessor:
             logger.error(f"Error in transcript processor pipeline: {e}")
             return {"error": str(e), "original": transcript_data}
     
+    async def warm_up(self):
+        """Load shared models up front so the first transcripts don't pay for it"""
+        if self._semantic_cache is not None:
+            try:
+                await self._semantic_cache.warm_up()
+            except Exception as e:
+                logger.warning("Semantic cache disabled: %s", e)
+                self._semantic_cache = None
+    
+    async def _run_pipeline(self, raw_text: str, frequency: str) -> tuple:
+        """Run the formatter and then the language agent on one transcript"""
+        # Step 1: Format/clean the raw transcript 
+        logger.info("📝 Formatting with ATC Phraseology Formatter...")
+        formatting_result = await self.phraseology_formatter.format_transcript(raw_text, frequency)
+        
+        formatted_text = formatting_result.get("formatted", raw_text)
+        
+        # Log what the formatter did
+        if formatting_result.get("changes_made"):
+            logger.info("✨ Formatter corrections: %s", formatting_result['changes_made'])
+            logger.info("📞 Formatted: '%s'", formatted_text)
+        else:
+            logger.info("✅ No formatting changes needed")
+        
+        # Step 2: Process the formatted transcript with ATC Language Agent
+        logger.info("🤖 Analyzing with ATC Language Agent...")
+        structured_data = await self.atc_agent.process_transcript(formatted_text, frequency)
+        return formatting_result, structured_data
+    
+    @staticmethod
+    def _cache_key(text: str, frequency: str) -> str:
+        """Hash the normalized transcript text (and frequency, which the prompts use)"""
+        normalized = f"{frequency}\n{_normalize_transcript(text)}"
+        return hashlib.sha256(normalized.encode()).hexdigest()
+    
     def get_recent_data(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Get recent processed data"""
-        return self.processed_data[-limit:]
+        return list(islice(self.processed_data, max(0, len(self.processed_data) - limit), None))
     
     def get_agent_stats(self) -> Dict[str, Any]:
         """Get combined statistics from both components"""
@@ -644,7 +934,11 @@ class ATCTranscriptProcessor:
             "formatter": formatter_stats,
             "language_agent": agent_stats,
             "pipeline": {
-                "total_processed": len(self.processed_data),
+                "total_processed": self.total_processed,
+                "cache_hits": self.cache_hits,
+                "cache_misses": self.cache_misses,
+                "semantic_hits": self.semantic_hits,
+                "cache_hit_rate": self.cache_hits / max(1, self.cache_hits + self.cache_misses),
                 "components": ["ATCPhraseologyFormatter", "ATCLanguageAgent"]
             }
         }
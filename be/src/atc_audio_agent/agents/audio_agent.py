@@ -1,10 +1,12 @@
 import asyncio
 import logging
 import json
-from typing import Dict, List, Optional, Callable
+import re
+from collections import defaultdict, deque
+from itertools import islice
+from typing import Deque, Dict, List, Optional, Callable, Tuple
 from datetime import datetime
-from dataclasses import dataclass, asdict
-import queue
+from dataclasses import dataclass
 import threading
 
 from audio_data.audio import AudioPipeline, create_transcription_engine, Transcript
@@ -13,9 +15,51 @@ from audio_data.audio import AudioPipeline, create_transcription_engine, Transcr
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Basic ATC terminology normalization, applied in a single pass by _clean_text
+_TEXT_REPLACEMENTS = {
+    "roger": "roger",
+    "wilco": "wilco",
+    "affirmative": "affirmative",
+    "negative": "negative",
+    "over": "over",
+    "out": "out",
+    "standby": "standby",
+    "cleared": "cleared",
+    "approved": "approved",
+    "unable": "unable"
+}
+_TEXT_REPLACEMENT_RE = re.compile("|".join(map(re.escape, _TEXT_REPLACEMENTS)))
+
+# Keywords per message type with the inflections each one accepts, matched as whole
+# words so "climbing" and "winds" count but "return" or "trafficked" don't
+_CLEARANCE = ("cleared", "approved", "authorized")
+_INSTRUCTION = (r"turn(?:s|ing)?", r"climb(?:s|ing)?", r"descend(?:s|ing)?",
+                r"maintain(?:s|ing)?", r"contact(?:s|ing)?")
+_READBACK = ("roger", "wilco", r"cop(?:y|ied|ying)", "understood")
+_WEATHER = ("weather", r"winds?", "visibility", r"ceilings?")
+_TRAFFIC = (r"traffic(?:s)?", "aircraft")
+_EMERGENCY = ("mayday", r"pan[\s-]+pan", r"emergenc(?:y|ies)")
+
+# Checked in priority order; the first category with a matching word wins
+_CATEGORY_ORDER = (
+    ("clearance", _CLEARANCE),
+    ("instruction", _INSTRUCTION),
+    ("readback", _READBACK),
+    ("weather", _WEATHER),
+    ("traffic", _TRAFFIC),
+    ("emergency", _EMERGENCY),
+)
+# One scan finds every category present; each match is tagged with its category's group
+_CATEGORY_RE = re.compile("|".join(
+    rf"\b(?P<{category}>{'|'.join(words)})\b" for category, words in _CATEGORY_ORDER
+))
+
 @dataclass
 class ATCMessage:
     """Represents a processed ATC communication message"""
+    __slots__ = ("id", "timestamp", "frequency", "raw_text", "cleaned_text",
+                 "message_type", "confidence", "source_engine", "metadata")
+    
     id: str
     timestamp: datetime
     frequency: str
@@ -26,6 +70,44 @@ class ATCMessage:
     source_engine: str
     metadata: Dict
 
+class SPSCRing:
+    """
+    Fixed-size single-producer/single-consumer ring buffer.
+    
+    Only the producer advances _tail and only the consumer advances _head, so
+    with one thread on each side no lock is needed: CPython list item stores
+    and int rebinds are atomic under the GIL.
+    """
+    
+    def __init__(self, capacity: int = 1024):
+        if capacity <= 0 or capacity & (capacity - 1):
+            raise ValueError("capacity must be a power of two")
+        self._buf: List[Optional[Transcript]] = [None] * capacity
+        self._mask = capacity - 1
+        self._head = 0
+        self._tail = 0
+    
+    def put(self, item: Transcript) -> bool:
+        """Enqueue an item; returns False if the ring is full (producer side)"""
+        if self._tail - self._head > self._mask:
+            return False
+        self._buf[self._tail & self._mask] = item
+        self._tail += 1
+        return True
+    
+    def get(self) -> Optional[Transcript]:
+        """Dequeue the oldest item, or None if empty (consumer side)"""
+        if self._head == self._tail:
+            return None
+        index = self._head & self._mask
+        item = self._buf[index]
+        self._buf[index] = None
+        self._head += 1
+        return item
+    
+    def __len__(self) -> int:
+        return self._tail - self._head
+
 class AudioAgent:
     """Main agent for processing ATC audio transcripts"""
     
@@ -42,7 +124,12 @@ class AudioAgent:
         
         # Audio pipelines for different frequencies
         self.pipelines: Dict[str, AudioPipeline] = {}
-        self.transcript_queue = queue.Queue(maxsize=1000)
+        
+        # One SPSC ring per frequency (each pipeline thread is a single producer),
+        # polled round-robin by the processing thread
+        self.transcript_rings: Dict[str, SPSCRing] = {}
+        self.ring_capacity = config.get("ring_capacity", 1024)
+        self._transcript_ready = threading.Event()
         
         # Processing state
         self._running = False
@@ -50,8 +137,15 @@ class AudioAgent:
         
         # Message tracking
         self.message_counter = 0
-        self.recent_messages: List[ATCMessage] = []
         self.max_recent_messages = 100
+        self.recent_messages: Deque[ATCMessage] = deque(maxlen=self.max_recent_messages)
+        self._by_type: Dict[str, Deque[ATCMessage]] = defaultdict(lambda: deque(maxlen=self.max_recent_messages))
+        self._by_frequency: Dict[str, Deque[ATCMessage]] = defaultdict(lambda: deque(maxlen=self.max_recent_messages))
+        
+        # raw text -> (cleaned_text, message_type) for recently seen transcripts,
+        # evicted oldest-first; only touched by the processing thread
+        self.max_text_cache = 256
+        self._text_cache: Dict[str, Tuple[str, str]] = {}
         
         logger.info("AudioAgent initialized")
     
@@ -88,8 +182,10 @@ class AudioAgent:
         self.pipelines.clear()
         
         # Wait for processing thread
+        self._transcript_ready.set()
         if self.processing_thread:
             self.processing_thread.join(timeout=5.0)
+        self.transcript_rings.clear()
         
         logger.info("AudioAgent stopped")
     
@@ -104,6 +200,9 @@ class AudioAgent:
             # Create transcription engine
             engine = create_transcription_engine(engine_type, **engine_config)
             
+            # Ring must exist before the pipeline starts producing
+            self.transcript_rings[frequency] = SPSCRing(self.ring_capacity)
+            
             # Create pipeline
             pipeline = AudioPipeline(
                 url=url,
@@ -118,51 +217,69 @@ class AudioAgent:
             pipeline.start()
             self.pipelines[frequency] = pipeline
             
-            logger.info(f"Started pipeline for {frequency}")
+            logger.info("Started pipeline for %s", frequency)
             
         except Exception as e:
             logger.error(f"Failed to start pipeline for {frequency}: {e}")
     
     def _on_transcript_received(self, transcript: Transcript):
         """Callback when a transcript is received from audio pipeline"""
-        try:
-            # Put transcript in queue for processing
-            self.transcript_queue.put(transcript, timeout=1.0)
-        except queue.Full:
-            logger.warning("Transcript queue full, dropping transcript")
+        ring = self.transcript_rings.get(transcript.frequency)
+        if ring is None or not ring.put(transcript):
+            logger.warning("Transcript ring full, dropping transcript")
+            return
+        self._transcript_ready.set()
     
     def _process_transcripts(self):
         """Main processing loop for transcripts"""
         while self._running:
-            try:
-                # Get transcript with timeout
-                transcript = self.transcript_queue.get(timeout=1.0)
-                
-                # Process the transcript
-                atc_message = self._process_transcript(transcript)
+            received = False
+            
+            # Round-robin over the per-frequency rings
+            for ring in list(self.transcript_rings.values()):
+                transcript = ring.get()
+                if transcript is None:
+                    continue
+                received = True
                 
-                if atc_message:
-                    # Forward to downstream agents
-                    self._forward_to_downstream_agents(atc_message)
-                    
-                    # Store in recent messages
-                    self._store_message(atc_message)
+                try:
+                    # Process the transcript
+                    atc_message = self._process_transcript(transcript)
                     
-            except queue.Empty:
-                continue
-            except Exception as e:
-                logger.error(f"Error processing transcript: {e}")
+                    if atc_message:
+                        # Forward to downstream agents
+                        self._forward_to_downstream_agents(atc_message)
+                        
+                        # Store in recent messages
+                        self._store_message(atc_message)
+                        
+                except Exception as e:
+                    logger.error(f"Error processing transcript: {e}")
+            
+            if not received:
+                # Event is a wakeup hint only; rings are re-polled after clearing
+                self._transcript_ready.wait(timeout=1.0)
+                self._transcript_ready.clear()
     
     def _process_transcript(self, transcript: Transcript) -> Optional[ATCMessage]:
         """Process a raw transcript into an ATC message"""
         if not transcript.text.strip():
             return None
         
-        # Basic text cleaning
-        cleaned_text = self._clean_text(transcript.text)
-        
-        # Determine message type
-        message_type = self._classify_message_type(cleaned_text)
+        # Repeated phrases (readbacks, boilerplate) reuse the earlier clean/classify result
+        cached = self._text_cache.get(transcript.text)
+        if cached is not None:
+            cleaned_text, message_type = cached
+        else:
+            # Basic text cleaning
+            cleaned_text = self._clean_text(transcript.text)
+            
+            # Determine message type
+            message_type = self._classify_message_type(cleaned_text)
+            
+            if len(self._text_cache) >= self.max_text_cache:
+                del self._text_cache[next(iter(self._text_cache))]
+            self._text_cache[transcript.text] = (cleaned_text, message_type)
         
         # Create ATC message
         atc_message = ATCMessage(
@@ -182,7 +299,7 @@ class AudioAgent:
         
         self.message_counter += 1
         
-        logger.debug(f"Processed message: {atc_message.id} - {message_type}")
+        logger.debug("Processed message: %s - %s", atc_message.id, message_type)
         return atc_message
     
     def _clean_text(self, text: str) -> str:
@@ -191,60 +308,21 @@ class AudioAgent:
         text = " ".join(text.split())
         
         # Basic ATC terminology normalization
-        replacements = {
-            "roger": "roger",
-            "wilco": "wilco",
-            "affirmative": "affirmative",
-            "negative": "negative",
-            "over": "over",
-            "out": "out",
-            "standby": "standby",
-            "cleared": "cleared",
-            "approved": "approved",
-            "unable": "unable"
-        }
-        
-        for old, new in replacements.items():
-            text = text.replace(old.lower(), new)
-        
-        return text
+        return _TEXT_REPLACEMENT_RE.sub(lambda m: _TEXT_REPLACEMENTS[m.group(0)], text)
     
     def _classify_message_type(self, text: str) -> str:
         """Classify the type of ATC message"""
-        text_lower = text.lower()
-        
-        # Clearance messages
-        if any(word in text_lower for word in ["cleared", "approved", "authorized"]):
-            return "clearance"
-        
-        # Instructions
-        if any(word in text_lower for word in ["turn", "climb", "descend", "maintain", "contact"]):
-            return "instruction"
-        
-        # Readbacks
-        if any(word in text_lower for word in ["roger", "wilco", "copy", "understood"]):
-            return "readback"
-        
-        # Weather
-        if any(word in text_lower for word in ["weather", "wind", "visibility", "ceiling"]):
-            return "weather"
+        found = {match.lastgroup for match in _CATEGORY_RE.finditer(text.lower())}
         
-        # Traffic
-        if any(word in text_lower for word in ["traffic", "aircraft", "traffic in sight"]):
-            return "traffic"
-        
-        # Emergency
-        if any(word in text_lower for word in ["mayday", "pan pan", "emergency"]):
-            return "emergency"
+        for category, _ in _CATEGORY_ORDER:
+            if category in found:
+                return category
         
         # Default
         return "general"
     
     def _forward_to_downstream_agents(self, atc_message: ATCMessage):
         """Forward processed message to downstream agents"""
-        message_dict = asdict(atc_message)
-        message_dict["timestamp"] = atc_message.timestamp.isoformat()
-        
         # Forward to StripAgent for parsing
         if self.strip_agent_callback:
             try:
@@ -267,26 +345,30 @@ class AudioAgent:
                 logger.error(f"Error forwarding to TaskAgent: {e}")
     
     def _store_message(self, atc_message: ATCMessage):
-        """Store message in recent messages list"""
+        """Store message in recent messages and the per-type/per-frequency indexes"""
+        # Bounded deques evict the oldest entry on append
         self.recent_messages.append(atc_message)
-        
-        # Keep only recent messages
-        if len(self.recent_messages) > self.max_recent_messages:
-            self.recent_messages = self.recent_messages[-self.max_recent_messages:]
+        self._by_type[atc_message.message_type].append(atc_message)
+        self._by_frequency[atc_message.frequency].append(atc_message)
+    
+    @staticmethod
+    def _tail(messages: Deque[ATCMessage], limit: int) -> List[ATCMessage]:
+        """Return the last `limit` messages in chronological order"""
+        return list(islice(reversed(messages), limit))[::-1]
     
     def get_recent_messages(self, limit: int = 10) -> List[ATCMessage]:
         """Get recent ATC messages"""
-        return self.recent_messages[-limit:]
+        return self._tail(self.recent_messages, limit)
     
     def get_messages_by_type(self, message_type: str, limit: int = 10) -> List[ATCMessage]:
         """Get recent messages of a specific type"""
-        filtered = [msg for msg in self.recent_messages if msg.message_type == message_type]
-        return filtered[-limit:]
+        messages = self._by_type.get(message_type)
+        return self._tail(messages, limit) if messages else []
     
     def get_messages_by_frequency(self, frequency: str, limit: int = 10) -> List[ATCMessage]:
         """Get recent messages from a specific frequency"""
-        filtered = [msg for msg in self.recent_messages if msg.frequency == frequency]
-        return filtered[-limit:]
+        messages = self._by_frequency.get(frequency)
+        return self._tail(messages, limit) if messages else []
     
     def is_running(self) -> bool:
         """Check if AudioAgent is running"""
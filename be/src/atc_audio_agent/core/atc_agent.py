@@ -13,6 +13,12 @@ from ..agents.atc_language_agent import ATCTranscriptProcessor
 import logging
 from pathlib import Path
 
+# Prefer libuv's event loop when available; falls back to the default asyncio loop
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
 # Load environment variables from root .env file
 load_dotenv(Path(__file__).parent.parent.parent.parent.parent / '.env')
 
@@ -23,14 +29,20 @@ logger = logging.getLogger(__name__)
 # Configuration from .env file
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 LIVEATC_URL = os.getenv("LIVEATC_URL", "https://d.liveatc.net/ksfo_twr")
+# Comma-separated for several frequencies; they share one FFmpeg process
+LIVEATC_URLS = [url.strip() for url in LIVEATC_URL.split(",") if url.strip()]
 WEBSOCKET_PORT = int(os.getenv("WEBSOCKET_PORT", "8765"))
+ENABLE_PLAYBACK = os.getenv("ENABLE_PLAYBACK", "false").lower() == "true"
+MAX_INFLIGHT = int(os.getenv("MAX_INFLIGHT", "16"))
 
-# Create the ATC Agent
+# Create the ATC Agent. uAgents binds its event loop here, so a uvloop loop is
+# handed in directly; installing the policy later would not reach this agent
 atc_agent = Agent(
     name="atc_audio_agent",
     seed="atc_audio_processing_seed_123",
     port=8001,
-    endpoint=["http://localhost:8001/submit"]
+    endpoint=["http://localhost:8001/submit"],
+    loop=uvloop.new_event_loop() if uvloop else None
 )
 
 # Global components
@@ -43,15 +55,26 @@ async def startup_handler(ctx: Context):
     global audio_processor, atc_language_processor
     
     logger.info("🚀 Starting ATC Audio Agent...")
+    logger.info("   - Event loop: %s", type(asyncio.get_running_loop()).__module__)
     
     # Initialize components
-    audio_processor = AudioProcessor(GROQ_API_KEY, WEBSOCKET_PORT)
+    audio_processor = AudioProcessor(
+        GROQ_API_KEY, WEBSOCKET_PORT,
+        max_in_flight=MAX_INFLIGHT,
+        enable_playback=ENABLE_PLAYBACK
+    )
     atc_language_processor = ATCTranscriptProcessor(GROQ_API_KEY)
     
     logger.info("✅ ATC Audio Agent initialized")
-    logger.info(f"   - Audio Source: {LIVEATC_URL}")
-    logger.info(f"   - WebSocket Port: {WEBSOCKET_PORT}")
-    logger.info(f"   - Agent Address: {ctx.address}")
+    logger.info("   - Audio Source: %s", ", ".join(LIVEATC_URLS))
+    logger.info("   - WebSocket Port: %s", WEBSOCKET_PORT)
+    logger.info("   - Agent Address: %s", ctx.address)
+
+@atc_agent.on_event("shutdown")
+async def shutdown_handler(ctx: Context):
+    """Release the audio processor's pooled connections"""
+    if audio_processor is not None:
+        await audio_processor.aclose()
 
 @atc_agent.on_interval(period=1.0)
 async def process_audio(ctx: Context):
@@ -66,7 +89,10 @@ async def process_audio(ctx: Context):
         websocket_server = await audio_processor.start_websocket_server()
         
         # Start audio streaming
-        await audio_processor.stream_audio(LIVEATC_URL)
+        if len(LIVEATC_URLS) > 1:
+            await audio_processor.stream_audio_multi(LIVEATC_URLS)
+        else:
+            await audio_processor.stream_audio(LIVEATC_URLS[0])
         
         # Close WebSocket server
         websocket_server.close()
@@ -84,7 +110,7 @@ async def handle_transcript(ctx: Context, sender: str, msg: dict):
         transcript_text = msg.get("text", "")
         
         if transcript_text:
-            logger.info(f"🤖 Processing transcript: {transcript_text}")
+            logger.info("🤖 Processing transcript: %s", transcript_text)
             
             # Process with ATC language agent
             transcript_data = {
@@ -95,20 +121,21 @@ async def handle_transcript(ctx: Context, sender: str, msg: dict):
                 "engine": "groq_whisper"
             }
             
+            # ATCTranscriptProcessor caches repeated phrases itself
             result = await atc_language_processor.process_audio_transcript(transcript_data)
             
-            if "atc_analysis" in result:
+            if "atc_analysis" in result and logger.isEnabledFor(logging.INFO):
                 analysis = result["atc_analysis"]
                 callsigns = analysis.get("callsigns", [])
                 instructions = analysis.get("instructions", [])
                 runways = analysis.get("runways", [])
                 
-                logger.info(f"🛩️  Callsigns: {[cs.get('callsign') for cs in callsigns]}")
-                logger.info(f"📋 Instructions: {[inst.get('type') for inst in instructions]}")
-                logger.info(f"🛬 Runways: {runways}")
+                logger.info("🛩️  Callsigns: %s", [cs.get('callsign') for cs in callsigns])
+                logger.info("📋 Instructions: %s", [inst.get('type') for inst in instructions])
+                logger.info("🛬 Runways: %s", runways)
                 
                 if analysis.get("summary"):
-                    logger.info(f"📝 Summary: {analysis['summary']}")
+                    logger.info("📝 Summary: %s", analysis['summary'])
 
 if __name__ == "__main__":
     logger.info("🎧 ATC Audio Agent Starting...")
@@ -4,56 +4,191 @@ Audio Processor for ATC Communications
 Handles audio streaming, transcription, and WebSocket broadcasting
 """
 import asyncio
+import os
+import selectors
 import subprocess
+import threading
 import logging
 import pyaudio
 import io
-import wave
+import struct
 import websockets
-import json
+import orjson
+import httpx
+from collections import deque
 from datetime import datetime
-from groq import Groq
+from typing import Dict, List, Optional, Tuple
+from groq import AsyncGroq
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class _PCMChunker:
+    """Accumulates raw PCM reads and cuts them into fixed-size transcription chunks
+    
+    Reads are copied into one preallocated ring of 2 * chunk_size bytes with
+    read/write offsets, so cutting a chunk never reallocates or shifts the
+    remaining buffer; the unread tail is compacted to the front only when the
+    ring runs out of room.
+    """
+    
+    def __init__(self, chunk_size: int):
+        self.chunk_size = chunk_size
+        self.chunk_count = 0
+        self._ring = bytearray(2 * chunk_size)
+        self._view = memoryview(self._ring)
+        self._read = 0
+        self._write = 0
+    
+    def feed(self, data: bytes) -> List[Tuple[int, bytes]]:
+        """Add data; return (chunk_count, chunk) for every chunk completed"""
+        ring_size = len(self._ring)
+        pending = memoryview(data)
+        
+        completed = []
+        while pending:
+            # Compact the unread tail to the front when the read won't fit
+            if self._read and ring_size - self._write < len(pending):
+                unread = self._write - self._read
+                self._ring[:unread] = self._view[self._read:self._write]
+                self._read, self._write = 0, unread
+            
+            n = min(len(pending), ring_size - self._write)
+            self._ring[self._write:self._write + n] = pending[:n]
+            self._write += n
+            pending = pending[n:]
+            
+            while self._write - self._read >= self.chunk_size:
+                self.chunk_count += 1
+                end = self._read + self.chunk_size
+                # Single copy: the chunk outlives the ring slot it came from
+                completed.append((self.chunk_count, bytes(self._view[self._read:end])))
+                self._read = end
+            
+            if self._read == self._write:
+                self._read = self._write = 0
+        return completed
+
+class _WavStream(io.RawIOBase):
+    """Read-only file object presenting a WAV header followed by PCM data
+    
+    Lets the multipart upload read straight from the PCM buffer instead of
+    first concatenating header and audio into a second in-memory file.
+    There is no fileno(), so httpx can't fstat it; it sizes the part by
+    seeking to the end and back (its fallback for in-memory streams), which
+    is why seek/tell are implemented. Seeking also lets retries rewind.
+    """
+    
+    def __init__(self, header: bytes, pcm: bytes, name: str = "audio.wav"):
+        self.name = name
+        self._parts = (memoryview(header), memoryview(pcm))
+        self._length = len(header) + len(pcm)
+        self._pos = 0
+    
+    def readable(self) -> bool:
+        return True
+    
+    def seekable(self) -> bool:
+        return True
+    
+    def tell(self) -> int:
+        return self._pos
+    
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self._length
+        self._pos = max(0, offset)
+        return self._pos
+    
+    def readinto(self, buf) -> int:
+        header, pcm = self._parts
+        out = memoryview(buf).cast("B")
+        written = 0
+        
+        while written < len(out) and self._pos < self._length:
+            if self._pos < len(header):
+                src = header[self._pos:]
+            else:
+                src = pcm[self._pos - len(header):]
+            n = min(len(src), len(out) - written)
+            out[written:written + n] = src[:n]
+            written += n
+            self._pos += n
+        return written
+
 class AudioProcessor:
-    def __init__(self, groq_api_key: str, websocket_port: int = 8765):
+    def __init__(self, groq_api_key: str, websocket_port: int = 8765,
+                 batch_size: int = 8, batch_window_ms: int = 500, max_in_flight: int = 16,
+                 enable_playback: bool = False, max_coalesced_chunks: int = 6):
         self.groq_api_key = groq_api_key
         self.websocket_port = websocket_port
+        self.enable_playback = enable_playback  # Local speaker output; off for server deployments
         self.websocket_clients = set()
-        self.groq_client = Groq(api_key=groq_api_key)
         
+        # Async client over a pooled HTTP/2 connection so concurrent transcriptions
+        # multiplex instead of each paying a TLS handshake; closed by aclose()
+        self._http_client = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+            timeout=30.0
+        )
+        self.groq_client = AsyncGroq(api_key=groq_api_key, http_client=self._http_client)
+        
+        # Transcription batching: flush when batch_size chunks are pending or
+        # batch_window_ms has passed since the first one was enqueued
+        self.batch_size = batch_size
+        self.batch_window = batch_window_ms / 1000
+        self._transcribe_queue: asyncio.Queue = asyncio.Queue()
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self._transcription_worker: Optional[asyncio.Task] = None
+        self._batch_tasks = set()
+        
+        # Backpressure: once max_in_flight chunks are queued or transcribing, new
+        # chunks are held per source and merged into that source's next upload
+        # (longer audio, fewer calls) instead of piling more requests onto Groq
+        self.max_in_flight = max_in_flight
+        self.max_coalesced_chunks = max_coalesced_chunks
+        self._outstanding = 0
+        self._pending_chunks: Dict[str, deque] = {}
+        
+        # 44-byte RIFF/WAVE header for 16 kHz mono 16-bit PCM; only the two
+        # length fields (offsets 4 and 40) vary per chunk
+        self._wav_header_template = struct.pack(
+            "<4sI4s4sIHHIIHH4sI",
+            b"RIFF", 0, b"WAVE", b"fmt ", 16, 1, 1, 16000, 32000, 2, 16, b"data", 0
+        )
+        
+    def wav_header(self, data_length: int, sample_rate: int = 16000) -> bytes:
+        """Build the 44-byte WAV header for data_length bytes of PCM"""
+        header = bytearray(self._wav_header_template)
+        struct.pack_into("<I", header, 4, 36 + data_length)
+        struct.pack_into("<I", header, 40, data_length)
+        if sample_rate != 16000:
+            struct.pack_into("<II", header, 24, sample_rate, sample_rate * 2)
+        
+        return bytes(header)
+
     def create_wav_header(self, audio_data: bytes, sample_rate: int = 16000) -> bytes:
         """Create a proper WAV file with header from raw PCM data"""
-        with io.BytesIO() as wav_buffer:
-            with wave.open(wav_buffer, 'wb') as wav_file:
-                wav_file.setnchannels(1)      # Mono
-                wav_file.setsampwidth(2)      # 16-bit = 2 bytes
-                wav_file.setframerate(sample_rate)  # 16kHz
-                wav_file.writeframes(audio_data)
-            
-            wav_buffer.seek(0)
-            return wav_buffer.getvalue()
+        return b"".join((self.wav_header(len(audio_data), sample_rate), memoryview(audio_data)))
 
     async def transcribe_audio(self, audio_data: bytes) -> str:
         """Transcribe audio using Groq Whisper"""
         try:
-            # Create proper WAV file
-            wav_data = self.create_wav_header(audio_data)
-            
-            # Create file-like object
-            audio_file = io.BytesIO(wav_data)
-            audio_file.name = "audio.wav"
+            # Stream header + PCM to the upload without building a WAV copy
+            audio_file = _WavStream(self.wav_header(len(audio_data)), audio_data)
             
             # Transcribe
-            transcription = self.groq_client.audio.transcriptions.create(
-                file=audio_file,
-                model="whisper-large-v3-turbo",
-                response_format="text",
-                language="en"
-            )
+            async with self._in_flight:
+                transcription = await self.groq_client.audio.transcriptions.create(
+                    file=("audio.wav", audio_file, "audio/wav"),
+                    model="whisper-large-v3-turbo",
+                    response_format="text",
+                    language="en"
+                )
             
             return transcription.strip()
             
@@ -61,40 +196,159 @@ class AudioProcessor:
             logger.error(f"Groq transcription error: {e}")
             return ""
 
+    async def transcribe_audio_batch(self, chunks: List[bytes]) -> List[str]:
+        """Transcribe several chunks concurrently, bounded by max_in_flight"""
+        return await asyncio.gather(*(self.transcribe_audio(chunk) for chunk in chunks))
+
+    async def submit_for_transcription(self, audio_chunk: bytes, chunk_count: int, source: str):
+        """Queue a chunk for batched transcription and return immediately"""
+        if self._transcription_worker is None or self._transcription_worker.done():
+            self._transcription_worker = asyncio.create_task(self._drain_transcription_queue())
+        
+        if self._outstanding >= self.max_in_flight:
+            pending = self._pending_chunks.setdefault(source, deque(maxlen=self.max_coalesced_chunks))
+            if len(pending) == pending.maxlen:
+                logger.warning("Transcription backlog full for %s, dropping chunk #%s", source, pending[0][0])
+            else:
+                logger.warning("In-flight cap reached, holding chunk #%s from %s", chunk_count, source)
+            pending.append((chunk_count, audio_chunk))
+            return
+        
+        pending = self._pending_chunks.pop(source, None)
+        if pending:
+            pending.append((chunk_count, audio_chunk))
+            self._enqueue_coalesced(pending, source)
+        else:
+            self._enqueue(chunk_count, audio_chunk, source)
+
+    def _enqueue(self, chunk_count: int, audio_chunk: bytes, source: str):
+        """Hand one upload to the batching worker"""
+        self._outstanding += 1
+        self._transcribe_queue.put_nowait((chunk_count, audio_chunk, source))
+
+    def _enqueue_coalesced(self, pending: deque, source: str):
+        """Merge held chunks into a single upload published under the latest chunk number"""
+        logger.info("Coalescing %s held chunk(s) from %s", len(pending), source)
+        self._enqueue(pending[-1][0], b"".join(audio_chunk for _, audio_chunk in pending), source)
+
+    def _flush_pending_chunks(self):
+        """Release held chunks as in-flight capacity frees up"""
+        while self._pending_chunks and self._outstanding < self.max_in_flight:
+            source = next(iter(self._pending_chunks))
+            self._enqueue_coalesced(self._pending_chunks.pop(source), source)
+
+    async def _drain_transcription_queue(self):
+        """Collect queued chunks into batches and dispatch each batch; a None item stops it"""
+        loop = asyncio.get_running_loop()
+        stopping = False
+        
+        while not stopping:
+            item = await self._transcribe_queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = loop.time() + self.batch_window
+            
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._transcribe_queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            
+            task = asyncio.create_task(self._transcribe_and_publish(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def flush_transcriptions(self):
+        """Transcribe and publish everything still held or queued, then stop the batching worker"""
+        worker, self._transcription_worker = self._transcription_worker, None
+        if worker is None or worker.done():
+            return
+        
+        # Held chunks go out now regardless of the in-flight cap; nothing new arrives after this
+        while self._pending_chunks:
+            source = next(iter(self._pending_chunks))
+            self._enqueue_coalesced(self._pending_chunks.pop(source), source)
+        
+        # The sentinel lands behind every queued chunk, so the worker dispatches them all first
+        self._transcribe_queue.put_nowait(None)
+        await worker
+        if self._batch_tasks:
+            await asyncio.gather(*self._batch_tasks, return_exceptions=True)
+
+    async def aclose(self):
+        """Finish pending transcriptions and close the pooled Groq connection; call on shutdown"""
+        await self.flush_transcriptions()
+        await self._http_client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def _transcribe_and_publish(self, batch: list):
+        """Transcribe a batch and broadcast each result under its chunk number"""
+        logger.info("📡 Transcribing batch of %s chunk(s) with Groq...", len(batch))
+        try:
+            transcripts = await self.transcribe_audio_batch([audio_chunk for _, audio_chunk, _ in batch])
+        finally:
+            self._outstanding -= len(batch)
+            self._flush_pending_chunks()
+        
+        for (chunk_count, _, source), transcript in zip(batch, transcripts):
+            await self._publish_transcript(chunk_count, transcript, source)
+
+    async def _publish_transcript(self, chunk_count: int, transcript: str, source: str):
+        """Broadcast a single chunk's transcript to WebSocket clients"""
+        if transcript and transcript.lower() != "thank you":
+            logger.info("✅ Transcript #%s: '%s'", chunk_count, transcript)
+            
+            # Broadcast to WebSocket clients
+            message = {
+                "type": "transcript",
+                "chunk": chunk_count,
+                "timestamp": datetime.now(),  # orjson emits ISO 8601
+                "text": transcript,
+                "source": source
+            }
+            
+            await self.broadcast_to_websockets(message)
+            logger.info("📡 Broadcasted to %s clients", len(self.websocket_clients))
+        else:
+            logger.info("❌ No meaningful transcription for chunk #%s", chunk_count)
+
     async def broadcast_to_websockets(self, message: dict):
         """Broadcast message to all connected WebSocket clients"""
         if not self.websocket_clients:
             return
             
-        message_json = json.dumps(message, indent=2)
-        disconnected = set()
-        
-        for client in self.websocket_clients:
-            try:
-                await client.send(message_json)
-            except websockets.exceptions.ConnectionClosed:
-                disconnected.add(client)
-            except Exception as e:
-                logger.error(f"Error broadcasting to client: {e}")
-                disconnected.add(client)
-        
-        # Remove disconnected clients
-        self.websocket_clients -= disconnected
+        # Serialize once (orjson output is already compact); websockets.broadcast writes the
+        # frame to every open connection without a per-client await. Closed clients are
+        # skipped here and removed by websocket_handler once wait_closed() returns.
+        websockets.broadcast(self.websocket_clients, orjson.dumps(message).decode())
 
     async def websocket_handler(self, websocket, path):
         """Handle WebSocket connections"""
         self.websocket_clients.add(websocket)
-        logger.info(f"WebSocket client connected. Total clients: {len(self.websocket_clients)}")
+        logger.info("WebSocket client connected. Total clients: %s", len(self.websocket_clients))
         
         try:
             await websocket.wait_closed()
         finally:
             self.websocket_clients.discard(websocket)
-            logger.info(f"WebSocket client disconnected. Total clients: {len(self.websocket_clients)}")
+            logger.info("WebSocket client disconnected. Total clients: %s", len(self.websocket_clients))
 
     async def start_websocket_server(self):
         """Start WebSocket server"""
-        logger.info(f"🌐 Starting WebSocket server on port {self.websocket_port}")
+        logger.info("🌐 Starting WebSocket server on port %s", self.websocket_port)
         return await websockets.serve(
             self.websocket_handler,
             "localhost",
@@ -103,7 +357,7 @@ class AudioProcessor:
 
     async def stream_audio(self, liveatc_url: str, chunk_duration: int = 5):
         """Stream audio from LiveATC and process in chunks"""
-        logger.info(f"🎵 Starting audio stream from {liveatc_url}")
+        logger.info("🎵 Starting audio stream from %s", liveatc_url)
         
         # Start FFmpeg process
         ffmpeg_cmd = [
@@ -124,77 +378,195 @@ class AudioProcessor:
         )
         
         # Initialize audio output
-        p = pyaudio.PyAudio()
-        stream = p.open(
-            format=pyaudio.paInt16,
-            channels=1,
-            rate=16000,
-            output=True
-        )
+        p = None
+        stream = None
+        if self.enable_playback:
+            p = pyaudio.PyAudio()
+            stream = p.open(
+                format=pyaudio.paInt16,
+                channels=1,
+                rate=16000,
+                output=True
+            )
+            logger.info("🔊 Audio streaming to speakers started")
         
-        logger.info("🔊 Audio streaming to speakers started")
-        logger.info(f"📝 Transcribing {chunk_duration}-second chunks")
+        logger.info("📝 Transcribing %s-second chunks", chunk_duration)
         
-        audio_buffer = bytearray()
         chunk_size = 16000 * 1 * 2 * chunk_duration  # chunk_duration seconds of 16-bit audio
-        chunk_count = 0
+        
+        # Blocking FFmpeg reads and speaker writes run on their own thread;
+        # the event loop only sees completed chunks
+        loop = asyncio.get_running_loop()
+        ready_chunks: asyncio.Queue = asyncio.Queue()
+        stop_event = threading.Event()
+        pump_thread = threading.Thread(
+            target=self._ffmpeg_pump_loop,
+            args=(process, stream, liveatc_url, chunk_size, ready_chunks, loop, stop_event),
+            daemon=True
+        )
+        pump_thread.start()
         
         try:
-            while True:
-                # Read audio data
-                chunk = process.stdout.read(4096)
-                if not chunk:
-                    break
-                
-                # Play to speakers immediately
-                stream.write(chunk)
-                
-                # Add to buffer for transcription
-                audio_buffer.extend(chunk)
-                
-                # Process when we have enough data
-                if len(audio_buffer) >= chunk_size:
-                    chunk_count += 1
-                    
-                    # Extract chunk for transcription
-                    audio_chunk = bytes(audio_buffer[:chunk_size])
-                    audio_buffer = audio_buffer[chunk_size:]
-                    
-                    logger.info(f"\n🎯 Processing chunk #{chunk_count} ({len(audio_chunk)} bytes)")
-                    
-                    # Transcribe
-                    logger.info("📡 Transcribing with Groq...")
-                    transcript = await self.transcribe_audio(audio_chunk)
-                    
-                    if transcript and transcript.lower() != "thank you":
-                        logger.info(f"✅ Transcript: '{transcript}'")
-                        
-                        # Broadcast to WebSocket clients
-                        message = {
-                            "type": "transcript",
-                            "chunk": chunk_count,
-                            "timestamp": datetime.now().isoformat(),
-                            "text": transcript,
-                            "source": liveatc_url
-                        }
-                        
-                        await self.broadcast_to_websockets(message)
-                        logger.info(f"📡 Broadcasted to {len(self.websocket_clients)} clients")
-                    else:
-                        logger.info("❌ No meaningful transcription")
-                        
+            await self._consume_ready_chunks(ready_chunks)
         except KeyboardInterrupt:
             logger.info("\n🛑 Stopping audio processor...")
         except Exception as e:
             logger.error(f"Error in audio processor: {e}")
         finally:
+            # Stop the pump before tearing down the stream it writes to
+            stop_event.set()
+            if process:
+                process.terminate()
+            await loop.run_in_executor(None, pump_thread.join, 5.0)
+            
+            # Don't drop chunks that were still waiting on Groq
+            await self.flush_transcriptions()
+            
             # Cleanup
             if stream:
                 stream.stop_stream()
                 stream.close()
             if p:
                 p.terminate()
-            if process:
-                process.terminate()
             
-            logger.info("🏁 Audio processor stopped") 
\ No newline at end of file
+            logger.info("🏁 Audio processor stopped")
+
+    async def stream_audio_multi(self, liveatc_urls: List[str], chunk_duration: int = 5):
+        """
+        Stream several LiveATC feeds through a single FFmpeg process
+        
+        Each input is decoded to its own pipe and all pipes are drained by one
+        selector thread, instead of one FFmpeg process and reader per feed.
+        Local playback is not supported here (the feeds would interleave).
+        """
+        logger.info("🎵 Starting %s audio streams through one FFmpeg process", len(liveatc_urls))
+        
+        ffmpeg_cmd = ["ffmpeg", "-loglevel", "error"]
+        for url in liveatc_urls:
+            ffmpeg_cmd += ["-i", url]
+        
+        # One raw 16 kHz mono 16-bit output per input, each written to its own pipe
+        pipes: Dict[int, str] = {}
+        write_fds = []
+        for index, url in enumerate(liveatc_urls):
+            read_fd, write_fd = os.pipe()
+            pipes[read_fd] = url
+            write_fds.append(write_fd)
+            ffmpeg_cmd += [
+                "-map", f"{index}:a",
+                "-ac", "1",
+                "-ar", "16000",
+                "-f", "s16le",
+                f"pipe:{write_fd}"
+            ]
+        
+        process = subprocess.Popen(
+            ffmpeg_cmd,
+            stdin=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            pass_fds=write_fds
+        )
+        
+        # Only FFmpeg holds the write ends now, so EOF propagates when it exits
+        for write_fd in write_fds:
+            os.close(write_fd)
+        
+        logger.info("📝 Transcribing %s-second chunks", chunk_duration)
+        
+        chunk_size = 16000 * 1 * 2 * chunk_duration
+        loop = asyncio.get_running_loop()
+        ready_chunks: asyncio.Queue = asyncio.Queue()
+        stop_event = threading.Event()
+        pump_thread = threading.Thread(
+            target=self._ffmpeg_multi_pump_loop,
+            args=(pipes, chunk_size, ready_chunks, loop, stop_event),
+            daemon=True
+        )
+        pump_thread.start()
+        
+        try:
+            await self._consume_ready_chunks(ready_chunks)
+        except Exception as e:
+            logger.error(f"Error in audio processor: {e}")
+        finally:
+            stop_event.set()
+            process.terminate()
+            await loop.run_in_executor(None, pump_thread.join, 5.0)
+            await self.flush_transcriptions()
+            
+            logger.info("🏁 Audio processor stopped")
+
+    async def _consume_ready_chunks(self, ready_chunks: asyncio.Queue):
+        """Submit chunks handed over by a pump thread until it signals EOF with None"""
+        while True:
+            item = await ready_chunks.get()
+            if item is None:
+                break
+            
+            source, chunk_count, audio_chunk = item
+            logger.info("\n🎯 Processing chunk #%s (%s bytes)", chunk_count, len(audio_chunk))
+            
+            # Queue for batched transcription
+            await self.submit_for_transcription(audio_chunk, chunk_count, source)
+
+    def _ffmpeg_pump_loop(self, process, stream, source: str, chunk_size: int, ready_chunks: asyncio.Queue,
+                          loop: asyncio.AbstractEventLoop, stop_event: threading.Event):
+        """Read FFmpeg output, play it and hand full chunks to the event loop (runs on a thread)"""
+        chunker = _PCMChunker(chunk_size)
+        
+        try:
+            while not stop_event.is_set():
+                # Read audio data
+                chunk = process.stdout.read(4096)
+                if not chunk:
+                    break
+                
+                # Play to speakers immediately
+                if stream:
+                    stream.write(chunk)
+                
+                # Buffer for transcription and hand over any completed chunks
+                for chunk_count, audio_chunk in chunker.feed(chunk):
+                    loop.call_soon_threadsafe(ready_chunks.put_nowait, (source, chunk_count, audio_chunk))
+                    
+        except Exception as e:
+            if not stop_event.is_set():
+                logger.error(f"Error in FFmpeg pump: {e}")
+        finally:
+            self._signal_pump_done(ready_chunks, loop)
+
+    def _ffmpeg_multi_pump_loop(self, pipes: Dict[int, str], chunk_size: int, ready_chunks: asyncio.Queue,
+                                loop: asyncio.AbstractEventLoop, stop_event: threading.Event):
+        """Drain every FFmpeg output pipe with one selector (runs on a thread)"""
+        selector = selectors.DefaultSelector()
+        for read_fd, source in pipes.items():
+            selector.register(read_fd, selectors.EVENT_READ, (source, _PCMChunker(chunk_size)))
+        
+        try:
+            while selector.get_map() and not stop_event.is_set():
+                for key, _ in selector.select(timeout=1.0):
+                    source, chunker = key.data
+                    chunk = os.read(key.fd, 4096)
+                    if not chunk:
+                        selector.unregister(key.fd)
+                        continue
+                    
+                    for chunk_count, audio_chunk in chunker.feed(chunk):
+                        loop.call_soon_threadsafe(ready_chunks.put_nowait, (source, chunk_count, audio_chunk))
+                        
+        except Exception as e:
+            if not stop_event.is_set():
+                logger.error(f"Error in FFmpeg pump: {e}")
+        finally:
+            selector.close()
+            for read_fd in pipes:
+                os.close(read_fd)
+            self._signal_pump_done(ready_chunks, loop)
+
+    @staticmethod
+    def _signal_pump_done(ready_chunks: asyncio.Queue, loop: asyncio.AbstractEventLoop):
+        """Wake the consumer so the stream coroutine can finish"""
+        try:
+            loop.call_soon_threadsafe(ready_chunks.put_nowait, None)
+        except RuntimeError:
+            pass  # Event loop already closed
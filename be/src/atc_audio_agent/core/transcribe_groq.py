@@ -1,11 +1,18 @@
 import os
 import logging
 import asyncio
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Callable, List, Optional
 from datetime import datetime
 import base64
 import io
-import wave
+import struct
+import hashlib
+import math
+import random
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
 from groq import Groq
 
 try:
@@ -13,6 +20,37 @@ try:
 except ImportError:
     groq = None
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Rate limits, 5xx and dropped/timed-out connections are worth another try; anything else fails fast
+if groq is not None:
+    _TRANSIENT_ERRORS = (groq.APIConnectionError, groq.RateLimitError, groq.InternalServerError)
+else:
+    _TRANSIENT_ERRORS = ()
+GROQ_RETRY_ATTEMPTS = 3
+# Clients used with _call_with_retry turn off the SDK's own retries so the two don't multiply
+GROQ_CLIENT_MAX_RETRIES = 0
+
+# Groq rejects uploads around 25MB; longer captures are split below that with 0.5s of overlap
+GROQ_MAX_UPLOAD_BYTES = 20 << 20
+SPLIT_OVERLAP_BYTES = 16000  # 0.5s of 16kHz 16-bit mono
+
+# Upload buffers kept for reuse; in-flight requests beyond this just allocate fresh ones
+BUFFER_POOL_SIZE = 8
+
+# xxh3 is much faster than any hashlib digest on audio-sized inputs; blake2b keeps caching working without it
+try:
+    import xxhash
+    _audio_key = xxhash.xxh3_64_intdigest
+except ImportError:
+    xxhash = None
+    
+    def _audio_key(audio_data: bytes) -> bytes:
+        return hashlib.blake2b(audio_data, digest_size=8).digest()
+
 logger = logging.getLogger(__name__)
 
 # ATC-specific model configuration
@@ -20,9 +58,89 @@ ATC_MODEL_NAME = "jacktol/whisper-medium.en-fine-tuned-for-ATC"
 ATC_MODEL_WER = 0.1508
 STANDARD_MODEL_WER = 0.9459  
 
+# Background event loop shared by the synchronous wrappers, started on first use
+_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_LOOP_LOCK = threading.Lock()
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    """Return the shared loop thread, so sync callers reuse one loop and the client's connection pool"""
+    global _LOOP
+    with _LOOP_LOCK:
+        if _LOOP is None:
+            _LOOP = asyncio.new_event_loop()
+            threading.Thread(target=_LOOP.run_forever, name="groq-transcribe-loop", daemon=True).start()
+        return _LOOP
+
+async def _call_with_retry(fn, on_settled: Optional[Callable[[], None]] = None, **kwargs):
+    """
+    Run a blocking Groq call in a thread, retrying transient failures with capped, jittered backoff
+    
+    on_settled runs once no thread is reading kwargs any more. A cancelled caller can't stop a
+    thread mid-request, so in that case it runs when the abandoned call finishes.
+    """
+    request = None
+    try:
+        for attempt in range(GROQ_RETRY_ATTEMPTS):
+            if attempt:
+                # The previous attempt consumed the upload; rewind it
+                kwargs["file"].seek(0)
+            # Shielded so cancelling the caller leaves the task tracking the thread until it returns
+            request = asyncio.ensure_future(asyncio.to_thread(fn, **kwargs))
+            try:
+                return await asyncio.shield(request)
+            except _TRANSIENT_ERRORS as e:
+                if attempt == GROQ_RETRY_ATTEMPTS - 1:
+                    raise
+                delay = min(2 ** attempt, 4) + random.random() * 0.25
+                logger.warning(f"Groq request failed ({e}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+    finally:
+        if on_settled is not None:
+            if request is None or request.done():
+                on_settled()
+            else:
+                request.add_done_callback(lambda done: _settle_abandoned(done, on_settled))
+
+def _settle_abandoned(request: asyncio.Future, on_settled: Callable[[], None]):
+    # Nobody awaits an abandoned request; retrieve its error so it isn't reported as unhandled
+    if not request.cancelled():
+        request.exception()
+    on_settled()
+
+def _split_pcm(audio_data: bytes) -> List[bytes]:
+    """Cut oversized PCM into near-equal slices on sample boundaries, each overlapping the previous one"""
+    count = math.ceil(len(audio_data) / GROQ_MAX_UPLOAD_BYTES)
+    step = math.ceil(len(audio_data) / count)
+    step += step % 2
+    return [
+        audio_data[max(0, i * step - SPLIT_OVERLAP_BYTES):(i + 1) * step]
+        for i in range(count)
+    ]
+
+def _merge_overlapping(texts: List[str], max_overlap_words: int = 20) -> str:
+    """Join slice transcripts, dropping the words the overlap made both sides hear"""
+    merged = texts[0].split()
+    for text in texts[1:]:
+        words = text.split()
+        for k in range(min(len(merged), len(words), max_overlap_words), 0, -1):
+            if [w.lower() for w in merged[-k:]] == [w.lower() for w in words[:k]]:
+                words = words[k:]
+                break
+        merged.extend(words)
+    return " ".join(merged)
+
+def _wav_header(n_bytes: int) -> bytes:
+    """44-byte RIFF/WAVE header for n_bytes of 16kHz mono 16-bit PCM"""
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + n_bytes, b'WAVE',
+        b'fmt ', 16, 1, 1, 16000, 32000, 2, 16,
+        b'data', n_bytes
+    )
+
 class GroqTranscriptionEngine:
     def __init__(self, api_key: str, model: str = "whisper-large-v3-turbo"):
-        self.client = Groq(api_key=api_key)
+        self.client = Groq(api_key=api_key, max_retries=GROQ_CLIENT_MAX_RETRIES)
         self.model = model
         self.atc_model_available = True
         self.use_atc_optimization = os.environ.get("USE_ATC_OPTIMIZED_MODEL", "true").lower() == "true"
@@ -41,7 +159,7 @@ class GroqTranscriptionEngine:
         Returns:
             Dict with transcription results
         """
-        start_time = datetime.now()
+        start_time = time.perf_counter()
         
         try:
             # Create a proper file-like object
@@ -52,8 +170,8 @@ class GroqTranscriptionEngine:
             # ATC model available but fallback used for latency optimization
             effective_model = self.model
             
-            # Call Groq API in a thread to avoid blocking
-            transcription = await asyncio.to_thread(
+            # Call Groq API in a thread to avoid blocking, retrying transient failures
+            transcription = await _call_with_retry(
                 self.client.audio.transcriptions.create,
                 file=audio_file,
                 model=effective_model,
@@ -61,14 +179,17 @@ class GroqTranscriptionEngine:
                 language="en"
             )
             
-            processing_time = (datetime.now() - start_time).total_seconds()
+            processing_time = time.perf_counter() - start_time
             
             # Apply ATC-specific post-processing when optimized model is configured
             confidence_boost = 0.15 if self.use_atc_optimization else 0.0
             base_confidence = 1.0 + confidence_boost
             
+            # One split gives both the whitespace-normalized text and the word count
+            words = transcription.split() if transcription else []
+            
             result = {
-                "text": transcription.strip() if transcription else "",
+                "text": " ".join(words),
                 "confidence": min(base_confidence, 1.0),
                 "frequency": frequency,
                 "timestamp": datetime.now().isoformat(),
@@ -76,14 +197,14 @@ class GroqTranscriptionEngine:
                 "engine": "groq",
                 "model": effective_model,
                 "atc_optimized": self.use_atc_optimization,
-                "word_count": len(transcription.split()) if transcription else 0
+                "word_count": len(words)
             }
             
             logger.info(f"Groq transcription completed in {processing_time:.2f}s: {result['text'][:100]}...")
             return result
             
         except Exception as e:
-            processing_time = (datetime.now() - start_time).total_seconds()
+            processing_time = time.perf_counter() - start_time
             logger.error(f"Groq transcription failed after {processing_time:.2f}s: {e}")
             
             return {
@@ -99,6 +220,11 @@ class GroqTranscriptionEngine:
                 "word_count": 0
             }
 
+@lru_cache(maxsize=4)
+def _get_client(api_key: str) -> Groq:
+    """Shared Groq client per API key so repeated calls keep their warm connection pool"""
+    return Groq(api_key=api_key)
+
 def transcribe_with_groq(audio_data: bytes, groq_api_key: str) -> str:
     """
     Simple synchronous transcription function for compatibility
@@ -111,7 +237,7 @@ def transcribe_with_groq(audio_data: bytes, groq_api_key: str) -> str:
         Transcribed text
     """
     try:
-        client = Groq(api_key=groq_api_key)
+        client = _get_client(groq_api_key)
         
         # Create a proper file-like object
         audio_file = io.BytesIO(audio_data)
@@ -133,94 +259,163 @@ def transcribe_with_groq(audio_data: bytes, groq_api_key: str) -> str:
 class GroqWhisperTranscriber:
     """Real-time transcription using Groq's Whisper API"""
     
-    def __init__(self, api_key: Optional[str] = None, model: str = "whisper-large-v3"):
+    def __init__(self, api_key: Optional[str] = None, model: str = "whisper-large-v3", max_cache_entries: int = 1024):
         self.api_key = api_key or os.getenv("GROQ_API_KEY")
         if not self.api_key:
             raise ValueError("Groq API key required. Set GROQ_API_KEY environment variable.")
         
         self.model = model
-        self.client = groq.Groq(api_key=self.api_key)
+        self.client = groq.Groq(api_key=self.api_key, max_retries=GROQ_CLIENT_MAX_RETRIES)
         self._session_stats = {
             "total_chunks": 0,
             "successful_transcriptions": 0,
             "failed_transcriptions": 0,
-            "total_processing_time": 0.0
+            "total_processing_time": 0.0,
+            "cache_hits": 0
         }
         
+        # LRU of audio hash -> transcription; idle loops and repeated chunks skip the API entirely
+        self.max_cache_entries = max_cache_entries
+        self._result_cache = OrderedDict()
+        
+        # Reusable upload buffers, so each chunk doesn't allocate a new header+PCM copy
+        self._buf_pool: List[io.BytesIO] = []
+        
         logger.info(f"Initialized Groq Whisper transcriber with model: {model}")
     
-    async def transcribe_audio_chunk(self, audio_data: bytes, frequency: str = "unknown") -> Dict[str, Any]:
-        """Transcribe an audio chunk asynchronously"""
-        import time
-        import wave
-        start_time = time.time()
-        
-        try:
-            # Create a proper WAV file with header from raw PCM data
-            with io.BytesIO() as wav_buffer:
-                with wave.open(wav_buffer, 'wb') as wav_file:
-                    wav_file.setnchannels(1)      # Mono
-                    wav_file.setsampwidth(2)      # 16-bit = 2 bytes
-                    wav_file.setframerate(16000)  # 16kHz
-                    wav_file.writeframes(audio_data)
-                
-                wav_buffer.seek(0)
-                wav_data = wav_buffer.getvalue()
-            
-            # Create a proper file-like object with the WAV data
-            audio_file = io.BytesIO(wav_data)
-            audio_file.name = "audio.wav"  # Set filename attribute
-            
-            # Use the audio transcription API
-            transcription = self.client.audio.transcriptions.create(
-                file=audio_file,
-                model="whisper-large-v3-turbo",
-                response_format="text",
-                language="en"
-            )
-            
-            processing_time = time.time() - start_time
-            
-            # Update stats
+    def _check_cache(self, audio_data: bytes, frequency: str):
+        """Return (cache key, result) where result is set for silent or previously seen audio"""
+        if not audio_data.strip(b'\x00'):
+            # Pure digital silence never transcribes to anything
             self._session_stats["total_chunks"] += 1
             self._session_stats["successful_transcriptions"] += 1
-            self._session_stats["total_processing_time"] += processing_time
-            
-            result = {
-                "text": transcription.strip(),
-                "confidence": 1.0,  # Assuming full confidence for text transcription
-                "frequency": frequency,
-                "timestamp": datetime.now().isoformat(),
-                "processing_time_ms": round(processing_time * 1000, 2),
-                "engine": "groq",
-                "model": self.model,
-                "word_count": len(transcription.split())
-            }
-            
-            logger.debug(f"Transcribed {frequency}: {result['text'][:50]}... ({processing_time:.2f}s)")
-            return result
-            
-        except Exception as e:
-            processing_time = time.time() - start_time
-            self._session_stats["total_chunks"] += 1
-            self._session_stats["failed_transcriptions"] += 1
-            
-            logger.error(f"Groq transcription error for {frequency}: {e}")
-            
-            return {
+            return None, {
                 "text": "",
-                "confidence": 0.0,
+                "confidence": 1.0,
                 "frequency": frequency,
                 "timestamp": datetime.now().isoformat(),
-                "processing_time_ms": round(processing_time * 1000, 2),
+                "processing_time_ms": 0.0,
                 "engine": "groq",
                 "model": self.model,
-                "error": str(e)
+                "word_count": 0
             }
+        
+        key = _audio_key(audio_data)
+        cached = self._result_cache.get(key)
+        if cached is None:
+            return key, None
+        
+        self._result_cache.move_to_end(key)
+        self._session_stats["total_chunks"] += 1
+        self._session_stats["successful_transcriptions"] += 1
+        self._session_stats["cache_hits"] += 1
+        return key, {**cached, "frequency": frequency, "timestamp": datetime.now().isoformat(), "processing_time_ms": 0.0}
+    
+    async def transcribe_audio_chunk(self, audio_data: bytes, frequency: str = "unknown") -> Dict[str, Any]:
+        """Transcribe an audio chunk asynchronously"""
+        key, cached = self._check_cache(audio_data, frequency)
+        if cached is not None:
+            return cached
+        return await self._transcribe_uncached(audio_data, frequency, key)
+    
+    async def _transcribe_uncached(self, audio_data: bytes, frequency: str, key) -> Dict[str, Any]:
+        """Send a chunk to Groq and remember the result under its audio hash"""
+        start_time = time.perf_counter()
+        
+        try:
+            transcription = await self._request_transcription(audio_data)
+        except Exception as e:
+            return self._failure_result(frequency, e, time.perf_counter() - start_time)
+        
+        return self._success_result(transcription, frequency, time.perf_counter() - start_time, key)
+    
+    async def _request_transcription(self, audio_data: bytes) -> str:
+        """The network stage: wrap PCM as WAV and return Groq's plain-text transcription"""
+        if len(audio_data) > GROQ_MAX_UPLOAD_BYTES:
+            # Too big for one upload: transcribe the slices concurrently and stitch them back together
+            texts = await asyncio.gather(*(self._request_slice(part) for part in _split_pcm(audio_data)))
+            return _merge_overlapping([text.strip() for text in texts])
+        return await self._request_slice(audio_data)
+    
+    def _acquire_buffer(self) -> io.BytesIO:
+        buf = self._buf_pool.pop() if self._buf_pool else io.BytesIO()
+        buf.seek(0)
+        return buf
+    
+    def _release_buffer(self, buf: io.BytesIO):
+        if len(self._buf_pool) < BUFFER_POOL_SIZE:
+            self._buf_pool.append(buf)
+    
+    async def _request_slice(self, audio_data: bytes) -> str:
+        # Write the fixed WAV header and raw PCM into a pooled buffer; truncate() drops any
+        # tail left from a longer previous chunk without giving up the buffer's capacity
+        audio_file = self._acquire_buffer()
+        audio_file.write(_wav_header(len(audio_data)))
+        audio_file.write(audio_data)
+        audio_file.truncate()
+        audio_file.seek(0)
+        audio_file.name = "audio.wav"  # Set filename attribute
+        
+        # Use the audio transcription API in a thread so concurrent chunks don't block the loop.
+        # The buffer goes back to the pool only once no thread is still uploading from it
+        return await _call_with_retry(
+            self.client.audio.transcriptions.create,
+            on_settled=lambda: self._release_buffer(audio_file),
+            file=audio_file,
+            model="whisper-large-v3-turbo",
+            response_format="text",
+            language="en"
+        )
+    
+    def _success_result(self, transcription: str, frequency: str, processing_time: float, key) -> Dict[str, Any]:
+        """The CPU stage: update stats, build the result dict and cache it"""
+        self._session_stats["total_chunks"] += 1
+        self._session_stats["successful_transcriptions"] += 1
+        self._session_stats["total_processing_time"] += processing_time
+        
+        # One split gives both the whitespace-normalized text and the word count
+        words = transcription.split()
+        
+        result = {
+            "text": " ".join(words),
+            "confidence": 1.0,  # Assuming full confidence for text transcription
+            "frequency": frequency,
+            "timestamp": datetime.now().isoformat(),
+            "processing_time_ms": round(processing_time * 1000, 2),
+            "engine": "groq",
+            "model": self.model,
+            "word_count": len(words)
+        }
+        
+        self._result_cache[key] = result
+        if len(self._result_cache) > self.max_cache_entries:
+            self._result_cache.popitem(last=False)
+        
+        logger.debug(f"Transcribed {frequency}: {result['text'][:50]}... ({processing_time:.2f}s)")
+        return result
+    
+    def _failure_result(self, frequency: str, error: Exception, processing_time: float) -> Dict[str, Any]:
+        self._session_stats["total_chunks"] += 1
+        self._session_stats["failed_transcriptions"] += 1
+        
+        logger.error(f"Groq transcription error for {frequency}: {error}")
+        
+        return {
+            "text": "",
+            "confidence": 0.0,
+            "frequency": frequency,
+            "timestamp": datetime.now().isoformat(),
+            "processing_time_ms": round(processing_time * 1000, 2),
+            "engine": "groq",
+            "model": self.model,
+            "error": str(error)
+        }
     
     def transcribe_audio_chunk_sync(self, audio_data: bytes, frequency: str = "unknown") -> Dict[str, Any]:
         """Synchronous version for compatibility"""
-        return asyncio.run(self.transcribe_audio_chunk(audio_data, frequency))
+        return asyncio.run_coroutine_threadsafe(
+            self.transcribe_audio_chunk(audio_data, frequency), _background_loop()
+        ).result()
     
     def get_session_stats(self) -> Dict[str, Any]:
         """Get transcription session statistics"""
@@ -238,7 +433,8 @@ class GroqWhisperTranscriber:
             "failed_transcriptions": self._session_stats["failed_transcriptions"],
             "success_rate": round(success_rate * 100, 2),
             "avg_processing_time_ms": round(avg_processing_time * 1000, 2),
-            "total_processing_time_ms": round(self._session_stats["total_processing_time"] * 1000, 2)
+            "total_processing_time_ms": round(self._session_stats["total_processing_time"] * 1000, 2),
+            "cache_hits": self._session_stats["cache_hits"]
         }
     
     def reset_stats(self):
@@ -247,13 +443,18 @@ class GroqWhisperTranscriber:
             "total_chunks": 0,
             "successful_transcriptions": 0,
             "failed_transcriptions": 0,
-            "total_processing_time": 0.0
+            "total_processing_time": 0.0,
+            "cache_hits": 0
         }
 
+def _pcm_to_float32(audio_data: bytes):
+    """16-bit PCM bytes -> float32 samples in [-1, 1), the array form faster-whisper accepts"""
+    return np.frombuffer(audio_data, dtype=np.int16).astype(np.float32) * (1.0 / 32768.0)
+
 class FasterWhisperTranscriber:
     """Local transcription using Faster Whisper (fallback when Groq is unavailable)"""
     
-    def __init__(self, model_name: str = "base", compute_type: str = "int8"):
+    def __init__(self, model_name: str = "base", compute_type: str = "int8", beam_size: int = 1):
         try:
             from faster_whisper import WhisperModel
             self.model = WhisperModel(model_name, compute_type=compute_type)
@@ -267,72 +468,65 @@ class FasterWhisperTranscriber:
             logger.info(f"Initialized Faster Whisper with model: {model_name}")
         except ImportError:
             raise ImportError("faster-whisper not installed. Run: pip install faster-whisper")
+        
+        # Greedy decoding by default; beam search costs roughly beam_size x the decoder work
+        self.beam_size = beam_size
     
     async def transcribe_audio_chunk(self, audio_data: bytes, frequency: str = "unknown") -> Dict[str, Any]:
         """Transcribe an audio chunk using Faster Whisper"""
-        import time
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         try:
-            # Create a temporary WAV file in memory
-            with io.BytesIO() as wav_buffer:
-                with wave.open(wav_buffer, 'wb') as wav_file:
-                    wav_file.setnchannels(1)  # Mono
-                    wav_file.setsampwidth(2)  # 16-bit
-                    wav_file.setframerate(16000)  # 16kHz
-                    wav_file.writeframes(audio_data)
-                
-                wav_buffer.seek(0)
-                
-                # Transcribe using Faster Whisper
-                segments, info = await asyncio.to_thread(
-                    self.model.transcribe,
-                    wav_buffer,
-                    language="en",
-                    beam_size=5
-                )
-                
-                # Combine segments
-                transcript = " ".join([seg.text.strip() for seg in segments])
-                
-                processing_time = time.time() - start_time
-                
-                # Update stats
-                self._session_stats["total_chunks"] += 1
-                self._session_stats["successful_transcriptions"] += 1
-                self._session_stats["total_processing_time"] += processing_time
-                
-                result = {
-                    "text": transcript,
-                    "confidence": segments[0].avg_logprob if segments else 0.0,
-                    "frequency": frequency,
-                    "timestamp": datetime.now().isoformat(),
-                    "processing_time_ms": round(processing_time * 1000, 2),
-                    "engine": "faster-whisper",
-                    "model": self.model_name,
-                    "word_count": len(transcript.split())
-                }
-                
-                logger.debug(f"Transcribed {frequency}: {transcript[:50]}... ({processing_time:.2f}s)")
-                return result
-                
+            # Hand the model float samples directly; without numpy, wrap the PCM as WAV for it to decode
+            audio = _pcm_to_float32(audio_data) if np is not None else io.BytesIO(_wav_header(len(audio_data)) + audio_data)
+            segments = await asyncio.to_thread(self._run_single, audio)
         except Exception as e:
-            processing_time = time.time() - start_time
-            self._session_stats["total_chunks"] += 1
-            self._session_stats["failed_transcriptions"] += 1
-            
+            processing_time = time.perf_counter() - start_time
             logger.error(f"Faster Whisper transcription error for {frequency}: {e}")
-            
-            return {
-                "text": "",
-                "confidence": 0.0,
-                "frequency": frequency,
-                "timestamp": datetime.now().isoformat(),
-                "processing_time_ms": round(processing_time * 1000, 2),
-                "engine": "faster-whisper",
-                "model": self.model_name,
-                "error": str(e)
-            }
+            self._record(processing_time, success=False)
+            return self._error_result(frequency, e, processing_time)
+        
+        processing_time = time.perf_counter() - start_time
+        self._record(processing_time, success=True)
+        return self._segments_result(frequency, segments, processing_time)
+    
+    def _record(self, processing_time: float, success: bool):
+        self._session_stats["total_chunks"] += 1
+        if success:
+            self._session_stats["successful_transcriptions"] += 1
+            self._session_stats["total_processing_time"] += processing_time
+        else:
+            self._session_stats["failed_transcriptions"] += 1
+    
+    def _segments_result(self, frequency: str, segments: list, processing_time: float) -> Dict[str, Any]:
+        transcript = " ".join(seg.text.strip() for seg in segments)
+        logger.debug(f"Transcribed {frequency}: {transcript[:50]}... ({processing_time:.2f}s)")
+        return {
+            "text": transcript,
+            "confidence": segments[0].avg_logprob if segments else 0.0,
+            "frequency": frequency,
+            "timestamp": datetime.now().isoformat(),
+            "processing_time_ms": round(processing_time * 1000, 2),
+            "engine": "faster-whisper",
+            "model": self.model_name,
+            "word_count": len(transcript.split())
+        }
+    
+    def _error_result(self, frequency: str, error: Exception, processing_time: float) -> Dict[str, Any]:
+        return {
+            "text": "",
+            "confidence": 0.0,
+            "frequency": frequency,
+            "timestamp": datetime.now().isoformat(),
+            "processing_time_ms": round(processing_time * 1000, 2),
+            "engine": "faster-whisper",
+            "model": self.model_name,
+            "error": str(error)
+        }
+    
+    def _run_single(self, audio) -> list:
+        segments, info = self.model.transcribe(audio, language="en", beam_size=self.beam_size)
+        return list(segments)
     
     def get_session_stats(self) -> Dict[str, Any]:
         """Get transcription session statistics"""
@@ -1,43 +1,68 @@
 import asyncio
 import websockets
-import json
+import orjson
 import logging
-from typing import Set, Dict, Any
+import time
+from typing import Dict, Any
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# Message timestamps only need ~50ms resolution; reuse the formatted string within that window
+_NOW_ISO_RESOLUTION = 0.05
+_now_iso_at = 0.0
+_now_iso_value = ""
+
+def _now_iso() -> str:
+    """Current local time in ISO format, reformatted at most once per _NOW_ISO_RESOLUTION"""
+    global _now_iso_at, _now_iso_value
+    now = time.time()
+    if now - _now_iso_at >= _NOW_ISO_RESOLUTION:
+        _now_iso_at = now
+        _now_iso_value = datetime.fromtimestamp(now).isoformat()
+    return _now_iso_value
+
 class WebSocketBroadcaster:
     """WebSocket server for broadcasting real-time ATC transcriptions"""
     
-    def __init__(self, host: str = "0.0.0.0", port: int = 8765):
+    def __init__(self, host: str = "0.0.0.0", port: int = 8765, client_queue_size: int = 64):
         self.host = host
         self.port = port
-        self.clients: Set[websockets.WebSocketServerProtocol] = set()
+        self.client_queue_size = client_queue_size
+        # Each client gets a bounded outbound queue drained by its own writer task
+        self.clients: Dict[websockets.WebSocketServerProtocol, asyncio.Queue] = {}
         self.server = None
         self._running = False
         
+        # Client message type -> handler
+        self._dispatch = {
+            "ping": self._on_ping,
+            "subscribe": self._on_subscribe
+        }
+        
     async def handler(self, websocket, path):
         """Handle WebSocket connections"""
         client_id = id(websocket)
-        self.clients.add(websocket)
+        queue = asyncio.Queue(maxsize=self.client_queue_size)
+        self.clients[websocket] = queue
+        writer = asyncio.create_task(self._writer(websocket, queue))
         logger.info(f"Client {client_id} connected. Total clients: {len(self.clients)}")
         
         try:
             # Send welcome message
-            await websocket.send(json.dumps({
+            await websocket.send(orjson.dumps({
                 "type": "connection",
                 "message": "Connected to ATC Audio Pipeline",
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": _now_iso(),
                 "client_id": client_id
-            }))
+            }).decode())
             
             # Keep connection alive and handle incoming messages
             async for message in websocket:
                 try:
-                    data = json.loads(message)
+                    data = orjson.loads(message)
                     await self._handle_client_message(websocket, data)
-                except json.JSONDecodeError:
+                except orjson.JSONDecodeError:
                     logger.warning(f"Invalid JSON from client {client_id}")
                 except Exception as e:
                     logger.error(f"Error handling client message: {e}")
@@ -47,109 +72,87 @@ class WebSocketBroadcaster:
         except Exception as e:
             logger.error(f"Error with client {client_id}: {e}")
         finally:
-            self.clients.remove(websocket)
+            writer.cancel()
+            self.clients.pop(websocket, None)
             logger.info(f"Client {client_id} removed. Total clients: {len(self.clients)}")
     
     async def _handle_client_message(self, websocket, data: Dict[str, Any]):
         """Handle incoming messages from clients"""
         msg_type = data.get("type", "unknown")
-        
-        if msg_type == "ping":
-            await websocket.send(json.dumps({
-                "type": "pong",
-                "timestamp": datetime.now().isoformat()
-            }))
-        elif msg_type == "subscribe":
-            # Client wants to subscribe to specific frequency
-            frequency = data.get("frequency", "all")
-            await websocket.send(json.dumps({
-                "type": "subscribed",
-                "frequency": frequency,
-                "timestamp": datetime.now().isoformat()
-            }))
-        else:
-            logger.debug(f"Unknown message type: {msg_type}")
+        await self._dispatch.get(msg_type, self._on_unknown)(websocket, data)
     
-    async def broadcast_transcript(self, transcript_data: Dict[str, Any]):
-        """Broadcast transcription to all connected clients"""
+    async def _on_ping(self, websocket, data: Dict[str, Any]):
+        await websocket.send(orjson.dumps({
+            "type": "pong",
+            "timestamp": _now_iso()
+        }).decode())
+    
+    async def _on_subscribe(self, websocket, data: Dict[str, Any]):
+        # Client wants to subscribe to specific frequency
+        frequency = data.get("frequency", "all")
+        await websocket.send(orjson.dumps({
+            "type": "subscribed",
+            "frequency": frequency,
+            "timestamp": _now_iso()
+        }).decode())
+    
+    async def _on_unknown(self, websocket, data: Dict[str, Any]):
+        logger.debug(f"Unknown message type: {data.get('type', 'unknown')}")
+    
+    async def _writer(self, websocket, queue: asyncio.Queue):
+        """Drain one client's outbound queue so a slow socket only ever delays itself"""
+        try:
+            while True:
+                message = await queue.get()
+                await websocket.send(message)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        except Exception as e:
+            logger.error(f"Error sending to client {id(websocket)}: {e}")
+            await websocket.close()
+    
+    def _enqueue_all(self, json_message: str) -> int:
+        """Queue a serialized message for every client; returns how many had to drop their oldest message"""
+        dropped = 0
+        for queue in self.clients.values():
+            try:
+                queue.put_nowait(json_message)
+            except asyncio.QueueFull:
+                queue.get_nowait()
+                queue.put_nowait(json_message)
+                dropped += 1
+        return dropped
+    
+    async def _broadcast(self, message_type: str, data: Dict[str, Any]):
+        """Stamp, serialize once and send a message of the given type to all connected clients"""
         if not self.clients:
             return
             
         message = {
-            "type": "transcript",
-            "timestamp": datetime.now().isoformat(),
-            **transcript_data
+            "type": message_type,
+            "timestamp": _now_iso(),
+            **data
         }
         
         # Convert to JSON once
-        json_message = json.dumps(message)
-        
-        # Broadcast to all clients
-        disconnected_clients = set()
+        json_message = orjson.dumps(message).decode()
         
-        for client in self.clients:
-            try:
-                await client.send(json_message)
-            except websockets.exceptions.ConnectionClosed:
-                disconnected_clients.add(client)
-            except Exception as e:
-                logger.error(f"Error sending to client: {e}")
-                disconnected_clients.add(client)
-        
-        # Remove disconnected clients
-        self.clients -= disconnected_clients
-        if disconnected_clients:
-            logger.info(f"Removed {len(disconnected_clients)} disconnected clients")
+        # Queue for every client; each writer task sends at its own pace
+        dropped = self._enqueue_all(json_message)
+        if dropped:
+            logger.warning(f"{dropped} slow clients dropped their oldest queued message for a new {message_type}")
+    
+    async def broadcast_transcript(self, transcript_data: Dict[str, Any]):
+        """Broadcast transcription to all connected clients"""
+        await self._broadcast("transcript", transcript_data)
     
     async def broadcast_status(self, status_data: Dict[str, Any]):
         """Broadcast pipeline status to all connected clients"""
-        if not self.clients:
-            return
-            
-        message = {
-            "type": "status",
-            "timestamp": datetime.now().isoformat(),
-            **status_data
-        }
-        
-        json_message = json.dumps(message)
-        disconnected_clients = set()
-        
-        for client in self.clients:
-            try:
-                await client.send(json_message)
-            except websockets.exceptions.ConnectionClosed:
-                disconnected_clients.add(client)
-            except Exception as e:
-                logger.error(f"Error sending status to client: {e}")
-                disconnected_clients.add(client)
-        
-        self.clients -= disconnected_clients
+        await self._broadcast("status", status_data)
     
     async def broadcast_emergency(self, emergency_data: Dict[str, Any]):
         """Broadcast emergency alerts to all connected clients"""
-        if not self.clients:
-            return
-            
-        message = {
-            "type": "emergency",
-            "timestamp": datetime.now().isoformat(),
-            **emergency_data
-        }
-        
-        json_message = json.dumps(message)
-        disconnected_clients = set()
-        
-        for client in self.clients:
-            try:
-                await client.send(json_message)
-            except websockets.exceptions.ConnectionClosed:
-                disconnected_clients.add(client)
-            except Exception as e:
-                logger.error(f"Error sending emergency to client: {e}")
-                disconnected_clients.add(client)
-        
-        self.clients -= disconnected_clients
+        await self._broadcast("emergency", emergency_data)
     
     async def start(self):
         """Start the WebSocket server"""
@@ -173,7 +176,7 @@ class WebSocketBroadcaster:
         
         # Close all client connections
         if self.clients:
-            await asyncio.wait([client.close() for client in self.clients])
+            await asyncio.gather(*(client.close() for client in list(self.clients)), return_exceptions=True)
             self.clients.clear()
         
         # Stop the server
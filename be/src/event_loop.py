@@ -0,0 +1,22 @@
+"""
+Event loop setup shared by the command-line entrypoints
+"""
+
+
+def install_uvloop() -> bool:
+    """
+    Make asyncio.run() use libuv's event loop when uvloop is installed
+
+    Call from a script's __main__ block, before any loop is created, so importing
+    a module never changes the loop policy of whoever imported it.
+
+    Returns:
+        Whether uvloop was installed; without it the default asyncio loop is used
+    """
+    try:
+        import uvloop
+    except ImportError:
+        return False
+
+    uvloop.install()
+    return True
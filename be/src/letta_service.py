@@ -1,22 +1,33 @@
+import asyncio
+import importlib.util
 import json
 import os
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
 from dataclasses import dataclass
 
+# letta_client pulls in a large dependency tree, so only check that it is installed
+# here and import it when an agent is actually created
+LETTA_AVAILABLE = importlib.util.find_spec("letta_client") is not None
+if not LETTA_AVAILABLE:
+    print("Warning: Letta client not installed. Run 'pip install letta-client'")
+
 try:
-    from letta_client import Letta, MessageCreate, TextContent
-    LETTA_AVAILABLE = True
+    import ijson
 except ImportError:
-    print("Warning: Letta client not installed. Run 'pip install letta-client'")
-    LETTA_AVAILABLE = False
-    Letta = None
-    MessageCreate = None
-    TextContent = None
+    ijson = None
+
+AGENT_NAME = "ATC_Shift_Controller"
+# Remembers the agent id across restarts so startup can skip listing every agent
+AGENT_ID_CACHE = os.path.expanduser("~/.cache/atc/letta_agent_id")
+# Manual notes not yet delivered to the agent, so a restart doesn't lose them
+PENDING_NOTES_FILE = os.path.expanduser("~/.cache/atc/letta_pending_notes.json")
 
 
 @dataclass
 class ShiftEvent:
+    __slots__ = ("timestamp", "callsign", "message", "event_type", "urgency", "summary")
+    
     timestamp: str
     callsign: str
     message: str
@@ -25,34 +36,74 @@ class ShiftEvent:
     summary: str
 
 
+def _read_todays_messages(messages_file: str, today_str: str) -> List[Dict[str, Any]]:
+    """Read today's raw messages (newest-first) from messages.json in a single pass"""
+    todays_messages = []
+    with open(messages_file, 'rb') as f:
+        # Stream rows with ijson when installed so old history is never materialized
+        messages = ijson.items(f, 'item', use_float=True) if ijson else json.load(f)
+        for msg in messages:
+            timestamp = msg['timestamp']
+            if timestamp.startswith(today_str):
+                todays_messages.append(msg)
+            elif timestamp < today_str:
+                # messages.json is written newest-first, so everything after this is older
+                break
+    return todays_messages
+
+
+def _to_shift_event(msg: Dict[str, Any]) -> ShiftEvent:
+    return ShiftEvent(
+        timestamp=msg['timestamp'],
+        callsign=msg['callsign'],
+        message=msg['message'],
+        event_type=msg.get('type', 'communication'),
+        urgency='urgent' if msg.get('isUrgent', False) else 'normal',
+        summary=msg.get('atc_data', {}).get('summary', msg['message'])
+    )
+
+
 class LettaShiftAgent:
     def __init__(self, api_key: str):
         """Initialize Letta agent for ATC shift management"""
         if not LETTA_AVAILABLE:
             raise ImportError("Letta client not available. Please install with: pip install letta-client")
         
-        # Initialize Letta client for cloud (uses token parameter)
-        self.client = Letta(token=api_key)
+        from letta_client import AsyncLetta, MessageCreate, TextContent
+        self._message_create = MessageCreate
+        self._text_content = TextContent
+        
+        # Initialize async Letta client for cloud (uses token parameter) so
+        # agent calls don't block the event loop
+        self.client = AsyncLetta(token=api_key)
+        # The agent keeps one conversation; overlapping sends (live updates,
+        # chat, summaries) would interleave replies, so they go one at a time
+        self._send_lock = asyncio.Lock()
+        self._flush_lock = asyncio.Lock()
         self.agent_id = None
         self.current_shift_events = []
         self.shift_memories = {}
-        
-        # Initialize agent
-        self._create_agent()
+        self._pending_notes: List[str] = self._load_pending_notes()
     
-    def _create_agent(self):
+    async def _create_agent(self):
         """Create or retrieve Letta agent"""
         try:
+            # Reuse the agent found on a previous run if it still exists
+            cached_id = self._load_cached_agent_id()
+            if cached_id and await self._agent_exists(cached_id):
+                self.agent_id = cached_id
+                return
+            
             # Try to get existing agent
-            agents = self.client.agents.list()
-            for agent in agents:
-                if agent.name == "ATC_Shift_Controller":
-                    self.agent_id = agent.id
-                    return
+            agents = await self.client.agents.list()
+            self.agent_id = next((agent.id for agent in agents if agent.name == AGENT_NAME), None)
+            if self.agent_id:
+                self._save_cached_agent_id(self.agent_id)
+                return
             
             # Create new agent if none exists using correct API
-            agent = self.client.agents.create(
-                name="ATC_Shift_Controller",
+            agent = await self.client.agents.create(
+                name=AGENT_NAME,
                 system="You are an experienced ATC supervisor who tracks events during shifts and provides detailed handover summaries. You remember patterns, ongoing situations, and critical details that incoming controllers need to know. Focus on:\n"
                       "- Critical ongoing situations\n"
                       "- Aircraft requiring special attention\n" 
@@ -64,40 +115,80 @@ class LettaShiftAgent:
                 include_base_tools=True
             )
             self.agent_id = agent.id
+            self._save_cached_agent_id(self.agent_id)
             
         except Exception as e:
             print(f"Error creating Letta agent: {e}")
             raise
     
+    async def _agent_exists(self, agent_id: str) -> bool:
+        """Check that a cached agent id still refers to a live agent"""
+        try:
+            await self.client.agents.retrieve(agent_id=agent_id)
+            return True
+        except Exception:
+            return False
+    
+    @staticmethod
+    def _load_cached_agent_id() -> Optional[str]:
+        try:
+            with open(AGENT_ID_CACHE, 'r') as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+    
+    @staticmethod
+    def _save_cached_agent_id(agent_id: str):
+        try:
+            os.makedirs(os.path.dirname(AGENT_ID_CACHE), exist_ok=True)
+            with open(AGENT_ID_CACHE, 'w') as f:
+                f.write(agent_id)
+        except OSError as e:
+            print(f"Warning: could not cache Letta agent id: {e}")
+    
+    @staticmethod
+    def _load_pending_notes() -> List[str]:
+        try:
+            with open(PENDING_NOTES_FILE, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+    
+    def _save_pending_notes(self):
+        try:
+            os.makedirs(os.path.dirname(PENDING_NOTES_FILE), exist_ok=True)
+            with open(PENDING_NOTES_FILE, 'w') as f:
+                json.dump(self._pending_notes, f)
+        except OSError as e:
+            print(f"Warning: could not save pending manual notes: {e}")
+    
+    async def send_message(self, text: str):
+        """Post a single user message to the agent"""
+        async with self._send_lock:
+            return await self.client.agents.messages.create(
+                agent_id=self.agent_id,
+                messages=[self._message_create(
+                    role="user",
+                    content=[self._text_content(
+                        type="text",
+                        text=text
+                    )]
+                )]
+            )
+    
     def load_todays_messages(self, messages_file: str = "../messages.json") -> List[ShiftEvent]:
         """Load today's events from messages.json"""
         try:
-            with open(messages_file, 'r') as f:
-                messages = json.load(f)
-            
-            today = datetime.now().date()
-            todays_events = []
+            todays_messages = _read_todays_messages(messages_file, datetime.now().date().isoformat())
             
-            for msg in messages:
-                msg_date = datetime.fromisoformat(msg['timestamp'].replace('Z', '+00:00')).date()
-                if msg_date == today:
-                    event = ShiftEvent(
-                        timestamp=msg['timestamp'],
-                        callsign=msg['callsign'],
-                        message=msg['message'],
-                        event_type=msg.get('type', 'communication'),
-                        urgency='urgent' if msg.get('isUrgent', False) else 'normal',
-                        summary=msg.get('atc_data', {}).get('summary', msg['message'])
-                    )
-                    todays_events.append(event)
-            
-            return sorted(todays_events, key=lambda x: x.timestamp)
+            # Walking the newest-first rows backwards yields events in chronological order
+            return [_to_shift_event(msg) for msg in reversed(todays_messages)]
             
         except Exception as e:
             print(f"Error loading messages: {e}")
             return []
     
-    def update_agent_memory(self, events: List[ShiftEvent]):
+    async def update_agent_memory(self, events: List[ShiftEvent]):
         """Update agent memory with new events"""
         if not events:
             return
@@ -105,63 +196,63 @@ class LettaShiftAgent:
         # Group events by hour for better processing
         events_summary = self._summarize_events_by_hour(events)
         
-        # Send events to agent
-        for hour_summary in events_summary:
-            try:
-                message_content = f"Events for {hour_summary['hour']}:\n{hour_summary['summary']}\n" \
-                                f"Key aircraft: {', '.join(hour_summary['key_callsigns'])}\n" \
-                                f"Notable instructions: {', '.join(hour_summary['instructions'])}"
-                
-                self.client.agents.messages.create(
-                    agent_id=self.agent_id,
-                    messages=[MessageCreate(
-                        role="user",
-                        content=[TextContent(
-                            type="text",
-                            text=message_content
-                        )]
-                    )]
-                )
-            except Exception as e:
-                print(f"Error updating agent memory: {e}")
+        # Send every hour bucket in one message rather than one round trip per hour
+        message_content = "\n\n".join(
+            f"Events for {hour_summary['hour']}:\n{hour_summary['summary']}\n"
+            f"Key aircraft: {', '.join(hour_summary['key_callsigns'])}\n"
+            f"Notable instructions: {', '.join(hour_summary['instructions'])}"
+            for hour_summary in events_summary
+        )
+        
+        try:
+            await self.send_message(message_content)
+        except Exception as e:
+            print(f"Error updating agent memory: {e}")
     
     def _summarize_events_by_hour(self, events: List[ShiftEvent]) -> List[Dict]:
         """Group and summarize events by hour"""
         hourly_events = {}
         
         for event in events:
-            hour = datetime.fromisoformat(event.timestamp.replace('Z', '+00:00')).strftime('%H:00')
-            if hour not in hourly_events:
-                hourly_events[hour] = {
-                    'events': [],
-                    'callsigns': set(),
-                    'instructions': set(),
+            # Timestamps are ISO strings, so the hour is always characters 11-12;
+            # slicing avoids a datetime parse and strftime per event
+            hour = f"{event.timestamp[11:13]}:00"
+            data = hourly_events.get(hour)
+            if data is None:
+                data = hourly_events[hour] = {
+                    'count': 0,
+                    'callsigns': {},
+                    'instructions': [],
                     'urgent_count': 0
                 }
             
-            hourly_events[hour]['events'].append(event)
-            hourly_events[hour]['callsigns'].add(event.callsign)
+            data['count'] += 1
+            data['callsigns'][event.callsign] = None
+            if len(data['instructions']) < 3:
+                data['instructions'].append(event.summary)
             if event.urgency == 'urgent':
-                hourly_events[hour]['urgent_count'] += 1
+                data['urgent_count'] += 1
         
         summaries = []
         for hour, data in hourly_events.items():
-            summary = f"Hour {hour}: {len(data['events'])} communications"
+            summary = f"Hour {hour}: {data['count']} communications"
             if data['urgent_count'] > 0:
                 summary += f" ({data['urgent_count']} urgent)"
             
             summaries.append({
                 'hour': hour,
                 'summary': summary,
-                'key_callsigns': list(data['callsigns'])[:5],  # Top 5 most active
-                'instructions': [event.summary for event in data['events'][:3]]  # Top 3 summaries
+                'key_callsigns': list(data['callsigns'])[:5],  # First 5 seen this hour
+                'instructions': data['instructions']  # First 3 summaries
             })
         
         return summaries
     
-    def generate_shift_summary(self, shift_type: str = "handover") -> str:
+    async def generate_shift_summary(self, shift_type: str = "handover") -> str:
         """Generate comprehensive shift summary"""
         try:
+            await self.flush_notes()
+            
             prompt = f"""Please provide a comprehensive {shift_type} summary for the incoming controller. Include:
 
 1. **Current Traffic Status**: Overall traffic volume and patterns
@@ -173,16 +264,7 @@ class LettaShiftAgent:
 
 Format this as a clear, actionable briefing that helps ensure safe and efficient operations."""
 
-            response = self.client.agents.messages.create(
-                agent_id=self.agent_id,
-                messages=[MessageCreate(
-                    role="user",
-                    content=[TextContent(
-                        type="text",
-                        text=prompt
-                    )]
-                )]
-            )
+            response = await self.send_message(prompt)
             
             return response.messages[-1].content
             
@@ -191,34 +273,34 @@ Format this as a clear, actionable briefing that helps ensure safe and efficient
             return "Error generating shift summary. Please check manually."
     
     def add_manual_note(self, note: str, category: str = "general"):
-        """Add manual note to agent memory"""
-        try:
-            formatted_note = f"[{category.upper()}] Manual note: {note}"
-            self.client.agents.messages.create(
-                agent_id=self.agent_id,
-                messages=[MessageCreate(
-                    role="user",
-                    content=[TextContent(
-                        type="text", 
-                        text=formatted_note
-                    )]
-                )]
-            )
-        except Exception as e:
-            print(f"Error adding manual note: {e}")
+        """Queue manual note for agent memory; saved to disk and sent on the next flush_notes()"""
+        self._pending_notes.append(f"[{category.upper()}] Manual note: {note}")
+        self._save_pending_notes()
     
-    def get_shift_patterns(self) -> Dict[str, Any]:
+    async def flush_notes(self):
+        """Send all pending manual notes to the agent in a single message"""
+        async with self._flush_lock:
+            if not self._pending_notes:
+                return
+            
+            # Notes stay queued (and on disk) until the agent has them
+            notes = self._pending_notes[:]
+            try:
+                await self.send_message("\n".join(notes))
+            except Exception as e:
+                print(f"Error adding manual notes, {len(notes)} kept for retry: {e}")
+                return
+            
+            del self._pending_notes[:len(notes)]
+            self._save_pending_notes()
+    
+    async def get_shift_patterns(self) -> Dict[str, Any]:
         """Analyze patterns from recent shifts"""
         try:
-            response = self.client.agents.messages.create(
-                agent_id=self.agent_id,
-                messages=[MessageCreate(
-                    role="user",
-                    content=[TextContent(
-                        type="text",
-                        text="What patterns have you noticed in recent shifts? Any recurring issues or trends?"
-                    )]
-                )]
+            await self.flush_notes()
+            
+            response = await self.send_message(
+                "What patterns have you noticed in recent shifts? Any recurring issues or trends?"
             )
             
             return {
@@ -232,18 +314,30 @@ Format this as a clear, actionable briefing that helps ensure safe and efficient
     def load_comprehensive_data(self, messages_file: str = "../messages.json") -> Dict[str, Any]:
         """Load comprehensive data including messages, weather, and context"""
         try:
-            # Load today's messages
-            events = self.load_todays_messages(messages_file)
+            now = datetime.now()
+            today = now.date()
             
-            # Load full message data
-            with open(messages_file, 'r') as f:
-                all_messages = json.load(f)
+            # One read serves both the raw messages and the derived events
+            todays_full_messages = _read_todays_messages(messages_file, today.isoformat())
             
-            today = datetime.now().date()
-            todays_full_messages = [
-                msg for msg in all_messages 
-                if datetime.fromisoformat(msg['timestamp'].replace('Z', '+00:00')).date() == today
-            ]
+            # Aggregate everything in a single walk over today's messages
+            events = []
+            callsigns = set()
+            urgent_messages = []
+            runways = set()
+            instructions = set()
+            for msg in todays_full_messages:
+                events.append(_to_shift_event(msg))
+                callsign = msg.get('callsign')
+                if callsign and callsign != 'SYSTEM':
+                    callsigns.add(callsign)
+                if msg.get('isUrgent', False):
+                    urgent_messages.append(msg)
+                # `or ()` also covers rows where these were stored as null
+                runways.update(msg.get('runways') or ())
+                instructions.update(msg.get('instructions') or ())
+            # Rows are newest-first; events are reported chronologically
+            events.reverse()
             
             # Create comprehensive data structure
             comprehensive_data = {
@@ -251,11 +345,11 @@ Format this as a clear, actionable briefing that helps ensure safe and efficient
                 "total_messages": len(todays_full_messages),
                 "events_summary": events,
                 "full_messages": todays_full_messages,
-                "callsigns": list(set([msg.get('callsign', '') for msg in todays_full_messages if msg.get('callsign') != 'SYSTEM'])),
-                "urgent_messages": [msg for msg in todays_full_messages if msg.get('isUrgent', False)],
-                "runway_activity": list(set([runway for msg in todays_full_messages for runway in msg.get('runways', [])])),
-                "instruction_types": list(set([inst for msg in todays_full_messages for inst in msg.get('instructions', [])])),
-                "analysis_timestamp": datetime.now().isoformat()
+                "callsigns": list(callsigns),
+                "urgent_messages": urgent_messages,
+                "runway_activity": list(runways),
+                "instruction_types": list(instructions),
+                "analysis_timestamp": now.isoformat()
             }
             
             return comprehensive_data
@@ -264,7 +358,7 @@ Format this as a clear, actionable briefing that helps ensure safe and efficient
             print(f"Error loading comprehensive data: {e}")
             return {"error": str(e)}
     
-    def update_comprehensive_memory(self, comprehensive_data: Dict[str, Any]):
+    async def update_comprehensive_memory(self, comprehensive_data: Dict[str, Any]):
         """Update agent memory with comprehensive shift data"""
         try:
             # Create detailed memory update
@@ -296,23 +390,17 @@ Format this as a clear, actionable briefing that helps ensure safe and efficient
 Please analyze this data and be ready to provide shift handover summaries.
 """
 
-            self.client.agents.messages.create(
-                agent_id=self.agent_id,
-                messages=[MessageCreate(
-                    role="user",
-                    content=[TextContent(
-                        type="text",
-                        text=memory_content
-                    )]
-                )]
-            )
+            await self.send_message(memory_content)
             
         except Exception as e:
             print(f"Error updating comprehensive memory: {e}")
     
-    def generate_markdown_summary(self, shift_type: str = "handover", include_weather: bool = True) -> str:
+    async def generate_markdown_summary(self, shift_type: str = "handover", include_weather: bool = True) -> str:
         """Generate comprehensive markdown-style shift summary"""
         try:
+            await self.flush_notes()
+            
+            now = datetime.now()
             weather_context = ""
             if include_weather:
                 weather_context = """
@@ -324,7 +412,7 @@ Please analyze this data and be ready to provide shift handover summaries.
 Generate a professional, well-structured summary using the following format:
 
 # 🛩️ ATC Shift Handover Summary
-**Date**: {datetime.now().strftime('%Y-%m-%d %H:%M')} UTC  
+**Date**: {now.strftime('%Y-%m-%d %H:%M')} UTC  
 **Shift Type**: {shift_type.title()}
 
 ## 📊 Current Traffic Status
@@ -357,20 +445,11 @@ Generate a professional, well-structured summary using the following format:
 [Any other relevant information for smooth shift transition]
 
 ---
-*Generated by ATC Shift Agent at {datetime.now().strftime('%H:%M')} UTC*
+*Generated by ATC Shift Agent at {now.strftime('%H:%M')} UTC*
 
 Please fill in this template based on all the shift data and recent communications you have in memory.{weather_context}"""
 
-            response = self.client.agents.messages.create(
-                agent_id=self.agent_id,
-                messages=[MessageCreate(
-                    role="user",
-                    content=[TextContent(
-                        type="text",
-                        text=prompt
-                    )]
-                )]
-            )
+            response = await self.send_message(prompt)
             
             return response.messages[-1].content
             
@@ -383,14 +462,16 @@ Please fill in this template based on all the shift data and recent communicatio
 letta_agent: Optional[LettaShiftAgent] = None
 
 
-def init_letta_agent(api_key: str) -> LettaShiftAgent:
+async def init_letta_agent(api_key: str) -> LettaShiftAgent:
     """Initialize global Letta agent"""
     if not LETTA_AVAILABLE:
         raise ImportError("Letta client not available. Please install with: pip install letta-client")
     
     global letta_agent
     if letta_agent is None:
-        letta_agent = LettaShiftAgent(api_key)
+        agent = LettaShiftAgent(api_key)
+        await agent._create_agent()
+        letta_agent = agent
     return letta_agent
 
 
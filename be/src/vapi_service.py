@@ -4,16 +4,76 @@ VAPI Emergency Dispatch Service
 Handles voice calls for emergency situations detected from ATC communications
 """
 import asyncio
+import itertools
 import logging
-import json
 import os
-from typing import Dict, List, Any, Optional
+import re
+import time
+from collections import deque
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
+from functools import lru_cache
 import aiohttp
-from dataclasses import dataclass, asdict
+import orjson
+from dataclasses import dataclass, fields
 
 logger = logging.getLogger(__name__)
 
+# Compiled once rather than on every dispatch script render
+_SOULS_RE = re.compile(r'(\d+)\s*souls', re.IGNORECASE)
+# Anything but digits and '+' is a display separator, dropped for E.164 ("+1-650-..." -> "+1650...")
+_PHONE_SEPARATORS_RE = re.compile(r'[^\d+]')
+_DEFAULT_SCRIPT = "Emergency situation reported for {callsign}"
+_FIRST_MESSAGE_PREFIX = ("This is an automated emergency dispatch from San Francisco International Airport "
+                         "Air Traffic Control. ")
+
+# Built-in defaults, used when the JSON override files are absent; built once at import
+# instead of on every VAPIService construction. Treated as read-only.
+DEFAULT_DISPATCH_CONFIGS = {
+    "emergency_services": {
+        "fire_rescue": "+1-650-599-1378",  # SFO Fire Dept
+        "medical": "+1-650-821-5151",      # SFGH Emergency
+        "airport_ops": "+1-650-821-7014", # SFO Operations
+        "faa_tower": "+1-650-876-2778"    # SFO Tower
+    },
+    "default_recipient": "airport_ops"
+}
+
+DEFAULT_EMERGENCY_PROTOCOLS = {
+    "bird_strike": {
+        "priority": "high",
+        "recipients": ["airport_ops", "fire_rescue"],
+        "script": "Emergency alert for {callsign}. Bird strike reported on departure. Aircraft returning to field with {souls} souls on board. Requesting immediate runway preparation and emergency vehicles."
+    },
+    "engine_failure": {
+        "priority": "critical", 
+        "recipients": ["fire_rescue", "medical", "airport_ops"],
+        "script": "Critical emergency for {callsign}. Engine failure reported. Aircraft attempting emergency landing. Request full emergency response including fire rescue and medical teams."
+    },
+    "medical_emergency": {
+        "priority": "critical",
+        "recipients": ["medical", "airport_ops"],
+        "script": "Medical emergency aboard {callsign}. Immediate medical response required upon landing. Prepare ambulance and medical personnel."
+    },
+    "fuel_emergency": {
+        "priority": "high",
+        "recipients": ["airport_ops", "fire_rescue"],
+        "script": "Fuel emergency declared by {callsign}. Aircraft requesting priority handling. Emergency vehicles should be on standby."
+    },
+    "general_emergency": {
+        "priority": "high",
+        "recipients": ["airport_ops"],
+        "script": "General emergency declared by {callsign}. Nature: {description}. Requesting appropriate emergency response coordination."
+    }
+}
+
+
+@lru_cache(maxsize=256)
+def _format_script(template: str, callsign: str, description: str, souls: str, timestamp: str) -> str:
+    """Fill a protocol script template; memoized since replays and repeat alerts reuse the same inputs"""
+    return template.format(callsign=callsign, description=description, souls=souls, timestamp=timestamp)
+
+
 @dataclass
 class DispatchCall:
     """Represents an emergency dispatch call"""
@@ -29,11 +89,26 @@ class DispatchCall:
     completed_at: Optional[datetime] = None
     call_duration: Optional[int] = None
     call_recording_url: Optional[str] = None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-ready record; DispatchCall is flat, so a shallow field copy replaces asdict()'s deep copy"""
+        record = {name: getattr(self, name) for name in _DISPATCH_CALL_FIELDS}
+        if self.initiated_at:
+            record["initiated_at"] = self.initiated_at.isoformat()
+        if self.completed_at:
+            record["completed_at"] = self.completed_at.isoformat()
+        return record
+
+_DISPATCH_CALL_FIELDS = tuple(f.name for f in fields(DispatchCall))
+
+DISPATCH_RECORDS_FILE = "dispatch_records.json"
+MAX_DISPATCH_RECORDS = 100
 
 class VAPIService:
     """Service for making emergency dispatch calls via VAPI"""
     
-    def __init__(self, vapi_token: str, base_url: str = "https://api.vapi.ai"):
+    def __init__(self, vapi_token: str, base_url: str = "https://api.vapi.ai", max_concurrent_calls: int = 10,
+                 records_flush_interval: float = 1.0, persist_records: bool = True):
         self.vapi_token = vapi_token
         self.base_url = base_url
         self.headers = {
@@ -41,107 +116,152 @@ class VAPIService:
             "Content-Type": "application/json"
         }
         
+        # Resolved once: the assistant used for every call, and whether calls are only simulated
+        self.assistant_id = os.getenv("VAPI_ASSISTANT_ID", "default_emergency_assistant")
+        self._simulate_calls = not vapi_token or vapi_token == "test_token" or len(vapi_token) < 10
+        
+        # One keep-alive session for every VAPI request, created on first use inside the running loop
+        self._session: Optional[aiohttp.ClientSession] = None
+        
+        # At most max_concurrent_calls VAPI calls in flight; each dispatch returns as soon as its
+        # own call is placed. The semaphore is created on the running loop.
+        self.max_concurrent_calls = max_concurrent_calls
+        self._loop = None
+        self._call_slots = None
+        self._in_flight = set()
+        
+        # Simulated call ids: per-process hex epoch prefix + counter, unique even within one second
+        self._sim_call_prefix = f"{int(time.time()):x}"
+        self._sim_call_counter = itertools.count(1)
+        
+        # Dispatch ids share a one-second timestamp, so a counter keeps same-second alerts distinct
+        self._dispatch_seq = itertools.count(1)
+        
         # Load dispatch configurations
         self.dispatch_configs = self._load_dispatch_configs()
         self.emergency_protocols = self._load_emergency_protocols()
         
+        # Configs are static, so resolve each emergency type's protocol, recipient and number up front
+        self._routes = self._build_routes()
+        self._default_route = self._routes["general_emergency"]
+        
+        # Dispatch records live in memory; changes are written back at most once per flush interval.
+        # With persist_records=False (test harnesses) they never touch dispatch_records.json.
+        # Bounded to the last MAX_DISPATCH_RECORDS; appending evicts the oldest with no slice copy
+        self._persist_records = persist_records
+        self._records: deque = deque(
+            self._load_dispatch_records() if persist_records else (),
+            maxlen=MAX_DISPATCH_RECORDS
+        )
+        self._records_dirty = False
+        self._records_flush_interval = records_flush_interval
+        self._flush_task: Optional[asyncio.Task] = None
+        
         logger.info("VAPI Service initialized")
     
     def _load_dispatch_configs(self) -> Dict[str, Any]:
         """Load dispatch configurations from JSON"""
         try:
-            with open("dispatch_configs.json", "r") as f:
-                return json.load(f)
+            with open("dispatch_configs.json", "rb") as f:
+                return orjson.loads(f.read())
         except FileNotFoundError:
             logger.warning("dispatch_configs.json not found, using defaults")
-            return {
-                "emergency_services": {
-                    "fire_rescue": "+1-650-599-1378",  # SFO Fire Dept
-                    "medical": "+1-650-821-5151",      # SFGH Emergency
-                    "airport_ops": "+1-650-821-7014", # SFO Operations
-                    "faa_tower": "+1-650-876-2778"    # SFO Tower
-                },
-                "default_recipient": "airport_ops"
-            }
+            return DEFAULT_DISPATCH_CONFIGS
     
     def _load_emergency_protocols(self) -> Dict[str, Any]:
         """Load emergency response protocols"""
         try:
-            with open("emergency_protocols.json", "r") as f:
-                return json.load(f)
+            with open("emergency_protocols.json", "rb") as f:
+                return orjson.loads(f.read())
         except FileNotFoundError:
-            logger.warning("emergency_protocols.json not found, creating defaults")
-            protocols = {
-                "bird_strike": {
-                    "priority": "high",
-                    "recipients": ["airport_ops", "fire_rescue"],
-                    "script": "Emergency alert for {callsign}. Bird strike reported on departure. Aircraft returning to field with {souls} souls on board. Requesting immediate runway preparation and emergency vehicles."
-                },
-                "engine_failure": {
-                    "priority": "critical", 
-                    "recipients": ["fire_rescue", "medical", "airport_ops"],
-                    "script": "Critical emergency for {callsign}. Engine failure reported. Aircraft attempting emergency landing. Request full emergency response including fire rescue and medical teams."
-                },
-                "medical_emergency": {
-                    "priority": "critical",
-                    "recipients": ["medical", "airport_ops"],
-                    "script": "Medical emergency aboard {callsign}. Immediate medical response required upon landing. Prepare ambulance and medical personnel."
-                },
-                "fuel_emergency": {
-                    "priority": "high",
-                    "recipients": ["airport_ops", "fire_rescue"],
-                    "script": "Fuel emergency declared by {callsign}. Aircraft requesting priority handling. Emergency vehicles should be on standby."
-                },
-                "general_emergency": {
-                    "priority": "high",
-                    "recipients": ["airport_ops"],
-                    "script": "General emergency declared by {callsign}. Nature: {description}. Requesting appropriate emergency response coordination."
-                }
-            }
-            
-            # Save default protocols
-            with open("emergency_protocols.json", "w") as f:
-                json.dump(protocols, f, indent=2)
-            
-            return protocols
+            logger.warning("emergency_protocols.json not found, using defaults")
+            return DEFAULT_EMERGENCY_PROTOCOLS
+    
+    @staticmethod
+    def bootstrap_defaults():
+        """Write the default config and protocol files if missing; call once when provisioning"""
+        for path, defaults in (("dispatch_configs.json", DEFAULT_DISPATCH_CONFIGS),
+                               ("emergency_protocols.json", DEFAULT_EMERGENCY_PROTOCOLS)):
+            if not os.path.exists(path):
+                with open(path, "wb") as f:
+                    f.write(orjson.dumps(defaults, option=orjson.OPT_INDENT_2))
+                logger.info(f"Wrote default {path}")
+    
+    def _build_routes(self) -> Dict[str, Tuple[str, str, str]]:
+        """Map each emergency type to (script template, primary recipient, phone number)"""
+        # Numbers are normalized to E.164 here, once, rather than per call
+        services = {
+            name: _PHONE_SEPARATORS_RE.sub('', number)
+            for name, number in self.dispatch_configs["emergency_services"].items()
+        }
+        default_number = services[self.dispatch_configs["default_recipient"]]
+        
+        routes = {}
+        for emergency_type, protocol in self.emergency_protocols.items():
+            primary_recipient = protocol.get("recipients", ["airport_ops"])[0]
+            routes[emergency_type] = (
+                protocol.get("script", _DEFAULT_SCRIPT),
+                primary_recipient,
+                services.get(primary_recipient, default_number)
+            )
+        return routes
     
     async def dispatch_emergency_call(self, alert_data: Dict[str, Any]) -> DispatchCall:
         """Dispatch an emergency call based on alert data"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._call_slots = asyncio.Semaphore(self.max_concurrent_calls)
+        task = loop.create_task(self._dispatch(alert_data))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+        # Shielded so a caller that stops waiting doesn't abandon a call mid-placement or lose its record
+        return await asyncio.shield(task)
+    
+    async def dispatch_many(self, alerts: List[Dict[str, Any]]) -> List[Any]:
+        """Dispatch several alerts concurrently; failed dispatches come back as their exception"""
+        return await asyncio.gather(
+            *(self.dispatch_emergency_call(alert_data) for alert_data in alerts),
+            return_exceptions=True
+        )
+    
+    async def _dispatch(self, alert_data: Dict[str, Any]) -> DispatchCall:
+        dispatch_call = await self._place_call(alert_data)
+        # Records are written back on a debounce, so a burst still costs one file write
+        self._save_dispatch_records([dispatch_call])
+        return dispatch_call
+    
+    async def _place_call(self, alert_data: Dict[str, Any]) -> DispatchCall:
+        """Build the dispatch record and place its VAPI call"""
         try:
             # Extract emergency info
             callsign = alert_data.get("callsign", "Unknown")
             emergency_type = alert_data.get("emergency_type", "general_emergency")
             description = alert_data.get("description", "")
             alert_id = alert_data.get("id", "")
+            now = datetime.now()
             
-            # Get protocol for this emergency type
-            protocol = self.emergency_protocols.get(emergency_type, self.emergency_protocols["general_emergency"])
-            
-            # Determine recipient
-            recipients = protocol.get("recipients", ["airport_ops"])
-            primary_recipient = recipients[0]
-            phone_number = self.dispatch_configs["emergency_services"].get(
-                primary_recipient,
-                self.dispatch_configs["emergency_services"][self.dispatch_configs["default_recipient"]]
-            )
+            # Script template, recipient and number were resolved per emergency type at startup
+            script_template, primary_recipient, phone_number = self._routes.get(emergency_type, self._default_route)
             
             # Create dispatch call record
             dispatch_call = DispatchCall(
-                id=f"dispatch_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{alert_id[:8]}",
+                id=f"dispatch_{now.strftime('%Y%m%d_%H%M%S')}_{next(self._dispatch_seq):06d}_{alert_id[:8]}",
                 alert_id=alert_id,
                 callsign=callsign,
                 emergency_type=emergency_type,
                 description=description,
                 call_recipient=primary_recipient,
                 call_status="pending",
-                initiated_at=datetime.now()
+                initiated_at=now
             )
             
             # Generate call script
-            call_script = self._generate_call_script(alert_data, protocol)
+            call_script = self._generate_call_script(alert_data, script_template, now)
             
             # Make the VAPI call
-            call_response = await self._make_vapi_call(phone_number, call_script, dispatch_call.id)
+            async with self._call_slots:
+                call_response = await self._make_vapi_call(phone_number, call_script, dispatch_call.id)
             
             if call_response.get("success"):
                 dispatch_call.call_id = call_response.get("call_id")
@@ -149,9 +269,6 @@ class VAPIService:
             else:
                 dispatch_call.call_status = "failed"
             
-            # Save dispatch record
-            self._save_dispatch_record(dispatch_call)
-            
             logger.info(f"Emergency dispatch initiated: {dispatch_call.id} for {callsign}")
             return dispatch_call
             
@@ -159,30 +276,19 @@ class VAPIService:
             logger.error(f"Failed to dispatch emergency call: {e}")
             raise
     
-    def _generate_call_script(self, alert_data: Dict[str, Any], protocol: Dict[str, Any]) -> str:
-        """Generate the call script based on alert data and protocol"""
-        script_template = protocol.get("script", "Emergency situation reported for {callsign}")
-        
+    def _generate_call_script(self, alert_data: Dict[str, Any], script_template: str, now: datetime) -> str:
+        """Generate the call script based on alert data and the protocol's script template"""
         # Extract relevant data from alert
         callsign = alert_data.get("callsign", "Unknown Aircraft")
         description = alert_data.get("description", "Emergency situation")
         original_message = alert_data.get("original_message", "")
         
         # Try to extract souls on board from message
-        souls = "unknown number of"
-        if "souls" in original_message.lower():
-            import re
-            souls_match = re.search(r'(\d+)\s*souls', original_message, re.IGNORECASE)
-            if souls_match:
-                souls = souls_match.group(1)
+        souls_match = _SOULS_RE.search(original_message)
+        souls = souls_match.group(1) if souls_match else "unknown number of"
         
-        # Format the script
-        script = script_template.format(
-            callsign=callsign,
-            description=description,
-            souls=souls,
-            timestamp=datetime.now().strftime("%H:%M UTC")
-        )
+        # Format the script (timestamp has minute resolution, so repeats within a minute hit the cache)
+        script = _format_script(script_template, callsign, description, souls, now.strftime("%H:%M UTC"))
         
         # Add original ATC message context
         if original_message:
@@ -190,27 +296,62 @@ class VAPIService:
         
         return script
     
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Shared session so repeat calls reuse pooled TCP/TLS connections instead of reconnecting"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                headers=self.headers,
+                connector=aiohttp.TCPConnector(limit=100, keepalive_timeout=60, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=30),
+                # Encode json= request bodies with orjson instead of the stdlib encoder
+                json_serialize=lambda obj: orjson.dumps(obj).decode()
+            )
+        return self._session
+    
+    async def aclose(self):
+        """Finish in-flight dispatches, write pending records and close the shared HTTP session; call on shutdown"""
+        # Calls already being placed finish first so their records make the final write
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        self._flush_records()
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
+    async def __aenter__(self) -> "VAPIService":
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+    
+    def _next_sim_call_id(self) -> str:
+        """Id for a simulated (development / fallback) call"""
+        return f"sim_call_{self._sim_call_prefix}_{next(self._sim_call_counter):x}"
+    
     async def _make_vapi_call(self, phone_number: str, script: str, dispatch_id: str) -> Dict[str, Any]:
         """Make the actual VAPI call"""
         try:
             # Check if we have a valid token and it's not a test token
-            if not self.vapi_token or self.vapi_token == "test_token" or len(self.vapi_token) < 10:
+            if self._simulate_calls:
                 logger.info(f"🔄 SIMULATED VAPI CALL to {phone_number}")
                 logger.info(f"📞 Script: {script}")
                 
                 # Simulate success in development mode
                 return {
                     "success": True,
-                    "call_id": f"sim_call_{int(datetime.now().timestamp())}"
+                    "call_id": self._next_sim_call_id()
                 }
             
             call_payload = {
-                "assistantId": os.getenv("VAPI_ASSISTANT_ID", "default_emergency_assistant"),
+                "assistantId": self.assistant_id,
                 "customer": {
                     "number": phone_number
                 },
                 "assistantOverrides": {
-                    "firstMessage": f"This is an automated emergency dispatch from San Francisco International Airport Air Traffic Control. {script}",
+                    "firstMessage": _FIRST_MESSAGE_PREFIX + script,
                     "variableValues": {
                         "dispatch_id": dispatch_id,
                         "emergency_script": script,
@@ -219,36 +360,34 @@ class VAPIService:
                 }
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.base_url}/call",
-                    headers=self.headers,
-                    json=call_payload
-                ) as response:
-                    if response.status == 201:
-                        result = await response.json()
-                        logger.info(f"VAPI call initiated successfully: {result.get('id')}")
+            async with self._get_session().post(
+                f"{self.base_url}/call",
+                json=call_payload
+            ) as response:
+                if response.status == 201:
+                    result = await response.json()
+                    logger.info(f"VAPI call initiated successfully: {result.get('id')}")
+                    return {
+                        "success": True,
+                        "call_id": result.get("id"),
+                        "status": result.get("status")
+                    }
+                else:
+                    error_text = await response.text()
+                    logger.error(f"VAPI call failed: {response.status} - {error_text}")
+                    
+                    # Fall back to simulation mode on auth errors
+                    if response.status == 401:
+                        logger.warning("Falling back to simulation mode due to auth error")
                         return {
                             "success": True,
-                            "call_id": result.get("id"),
-                            "status": result.get("status")
-                        }
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"VAPI call failed: {response.status} - {error_text}")
-                        
-                        # Fall back to simulation mode on auth errors
-                        if response.status == 401:
-                            logger.warning("Falling back to simulation mode due to auth error")
-                            return {
-                                "success": True,
-                                "call_id": f"sim_call_{int(datetime.now().timestamp())}"
-                            }
-                        
-                        return {
-                            "success": False,
-                            "error": f"HTTP {response.status}: {error_text}"
+                            "call_id": self._next_sim_call_id()
                         }
+                    
+                    return {
+                        "success": False,
+                        "error": f"HTTP {response.status}: {error_text}"
+                    }
         
         except Exception as e:
             logger.error(f"Error making VAPI call: {e}")
@@ -256,82 +395,92 @@ class VAPIService:
             logger.warning("Falling back to simulation mode due to error")
             return {
                 "success": True,
-                "call_id": f"sim_call_{int(datetime.now().timestamp())}"
+                "call_id": self._next_sim_call_id()
             }
     
-    def _save_dispatch_record(self, dispatch_call: DispatchCall):
-        """Save dispatch record to JSON file"""
+    def _load_dispatch_records(self) -> List[Dict[str, Any]]:
         try:
-            # Load existing records
-            try:
-                with open("dispatch_records.json", "r") as f:
-                    records = json.load(f)
-            except FileNotFoundError:
-                records = []
-            
-            # Add new record
-            record_dict = asdict(dispatch_call)
-            if record_dict["initiated_at"]:
-                record_dict["initiated_at"] = record_dict["initiated_at"].isoformat()
-            if record_dict["completed_at"]:
-                record_dict["completed_at"] = record_dict["completed_at"].isoformat()
-            
-            records.append(record_dict)
-            
-            # Keep only last 100 records
-            records = records[-100:]
-            
-            # Save back to file
-            with open("dispatch_records.json", "w") as f:
-                json.dump(records, f, indent=2)
-                
+            with open(DISPATCH_RECORDS_FILE, "rb") as f:
+                return orjson.loads(f.read())
+        except FileNotFoundError:
+            return []
+        except Exception as e:
+            logger.error(f"Failed to load dispatch records: {e}")
+            return []
+    
+    def _save_dispatch_records(self, dispatch_calls: List[DispatchCall]):
+        """Append dispatch records to the in-memory list and schedule a write"""
+        if not dispatch_calls:
+            return
+        
+        self._records.extend(dispatch_call.to_dict() for dispatch_call in dispatch_calls)
+        self._mark_records_dirty()
+    
+    def _mark_records_dirty(self):
+        """Debounce writes: inside a loop, coalesce changes into one delayed flush"""
+        if not self._persist_records:
+            return
+        self._records_dirty = True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No loop to defer to (sync caller), so write through
+            self._flush_records()
+            return
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = loop.create_task(self._flush_later())
+    
+    async def _flush_later(self):
+        await asyncio.sleep(self._records_flush_interval)
+        # Serialize on the loop so the records can't change mid-dump; only the disk write is offloaded
+        payload = self._take_records_payload()
+        if payload is not None:
+            await asyncio.to_thread(self._write_records, payload)
+    
+    def _take_records_payload(self) -> Optional[bytes]:
+        if not self._records_dirty:
+            return None
+        self._records_dirty = False
+        return orjson.dumps(list(self._records), option=orjson.OPT_INDENT_2)
+    
+    def _flush_records(self):
+        payload = self._take_records_payload()
+        if payload is not None:
+            self._write_records(payload)
+    
+    @staticmethod
+    def _write_records(payload: bytes):
+        try:
+            with open(DISPATCH_RECORDS_FILE, "wb") as f:
+                f.write(payload)
         except Exception as e:
             logger.error(f"Failed to save dispatch record: {e}")
     
     async def get_call_status(self, call_id: str) -> Dict[str, Any]:
         """Get status of a VAPI call"""
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    f"{self.base_url}/call/{call_id}",
-                    headers=self.headers
-                ) as response:
-                    if response.status == 200:
-                        return await response.json()
-                    else:
-                        return {"error": f"HTTP {response.status}"}
+            async with self._get_session().get(f"{self.base_url}/call/{call_id}") as response:
+                if response.status == 200:
+                    return await response.json()
+                else:
+                    return {"error": f"HTTP {response.status}"}
         except Exception as e:
             logger.error(f"Error getting call status: {e}")
             return {"error": str(e)}
     
     def get_dispatch_records(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Get recent dispatch records"""
-        try:
-            with open("dispatch_records.json", "r") as f:
-                records = json.load(f)
-                return records[-limit:]
-        except FileNotFoundError:
-            return []
+        return list(itertools.islice(self._records, max(0, len(self._records) - limit), None))
     
     def mark_dispatch_completed(self, dispatch_id: str, call_duration: int = None):
         """Mark a dispatch as completed"""
-        try:
-            with open("dispatch_records.json", "r") as f:
-                records = json.load(f)
-            
-            for record in records:
-                if record["id"] == dispatch_id:
-                    record["call_status"] = "completed"
-                    record["completed_at"] = datetime.now().isoformat()
-                    if call_duration:
-                        record["call_duration"] = call_duration
-                    break
-            
-            with open("dispatch_records.json", "w") as f:
-                json.dump(records, f, indent=2)
-                
-        except Exception as e:
-            logger.error(f"Failed to mark dispatch completed: {e}")
+        record = next((r for r in self._records if r["id"] == dispatch_id), None)
+        if record is not None:
+            record["call_status"] = "completed"
+            record["completed_at"] = datetime.now().isoformat()
+            if call_duration:
+                record["call_duration"] = call_duration
+            self._mark_records_dirty()
 
 # Example usage and testing
 if __name__ == "__main__":
@@ -340,24 +489,23 @@ if __name__ == "__main__":
         if not vapi_token:
             raise ValueError("VAPI_TOKEN environment variable required")
         
-        service = VAPIService(vapi_token)
-        
-        # Test emergency alert
-        test_alert = {
-            "id": "test_alert_001",
-            "callsign": "AAL445",
-            "emergency_type": "bird_strike",
-            "description": "Bird strike on departure, returning to field",
-            "original_message": "American 445, EMERGENCY, bird strike on departure, returning to field, 180 souls on board"
-        }
-        
-        # Dispatch call
-        dispatch_call = await service.dispatch_emergency_call(test_alert)
-        print(f"Dispatch initiated: {dispatch_call.id}")
-        print(f"Call status: {dispatch_call.call_status}")
-        
-        # Check records
-        records = service.get_dispatch_records(5)
-        print(f"Recent dispatches: {len(records)}")
+        async with VAPIService(vapi_token) as service:
+            # Test emergency alert
+            test_alert = {
+                "id": "test_alert_001",
+                "callsign": "AAL445",
+                "emergency_type": "bird_strike",
+                "description": "Bird strike on departure, returning to field",
+                "original_message": "American 445, EMERGENCY, bird strike on departure, returning to field, 180 souls on board"
+            }
+            
+            # Dispatch call
+            dispatch_call = await service.dispatch_emergency_call(test_alert)
+            print(f"Dispatch initiated: {dispatch_call.id}")
+            print(f"Call status: {dispatch_call.call_status}")
+            
+            # Check records
+            records = service.get_dispatch_records(5)
+            print(f"Recent dispatches: {len(records)}")
     
     asyncio.run(test_vapi_service()) 
\ No newline at end of file
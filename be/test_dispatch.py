@@ -7,6 +7,7 @@ import os
 import asyncio
 from datetime import datetime
 from src.vapi_service import VAPIService
+from src.event_loop import install_uvloop
 
 async def test_dispatch_system():
     """Test the complete dispatch workflow"""
@@ -38,43 +39,45 @@ async def test_dispatch_system():
         }
     ]
     
-    # Initialize VAPI service (will use simulation mode without token)
-    vapi_service = VAPIService("test_token")
+    # Write editable default config files on first run
+    VAPIService.bootstrap_defaults()
     
-    print(f"📋 Testing {len(test_emergencies)} emergency scenarios...")
-    print()
-    
-    for i, emergency in enumerate(test_emergencies, 1):
-        print(f"Test {i}: {emergency['callsign']} - {emergency['emergency_type']}")
-        print(f"  Description: {emergency['description']}")
-        print(f"  Original ATC: {emergency['original_message']}")
+    # Initialize VAPI service (will use simulation mode without token);
+    # leaving the block flushes pending dispatch records to disk
+    async with VAPIService("test_token") as vapi_service:
+        print(f"📋 Testing {len(test_emergencies)} emergency scenarios...")
+        print()
         
-        try:
-            # Dispatch the emergency
-            dispatch_call = await vapi_service.dispatch_emergency_call(emergency)
-            
-            print(f"  ✅ Dispatch ID: {dispatch_call.id}")
-            print(f"  📞 Call Status: {dispatch_call.call_status}")
-            print(f"  🎯 Recipient: {dispatch_call.call_recipient}")
-            print(f"  ⏰ Initiated: {dispatch_call.initiated_at}")
+        # Dispatch all emergencies concurrently, as a burst of alerts would arrive
+        results = await vapi_service.dispatch_many(test_emergencies)
+        
+        for i, (emergency, dispatch_call) in enumerate(zip(test_emergencies, results), 1):
+            print(f"Test {i}: {emergency['callsign']} - {emergency['emergency_type']}")
+            print(f"  Description: {emergency['description']}")
+            print(f"  Original ATC: {emergency['original_message']}")
             
-            if dispatch_call.call_id:
-                print(f"  🆔 Call ID: {dispatch_call.call_id}")
+            if isinstance(dispatch_call, Exception):
+                print(f"  ❌ Error: {dispatch_call}")
+            else:
+                print(f"  ✅ Dispatch ID: {dispatch_call.id}")
+                print(f"  📞 Call Status: {dispatch_call.call_status}")
+                print(f"  🎯 Recipient: {dispatch_call.call_recipient}")
+                print(f"  ⏰ Initiated: {dispatch_call.initiated_at}")
+                
+                if dispatch_call.call_id:
+                    print(f"  🆔 Call ID: {dispatch_call.call_id}")
             
-        except Exception as e:
-            print(f"  ❌ Error: {e}")
+            print()
         
-        print()
-    
-    # Check dispatch records
-    print("📊 Recent Dispatch Records:")
-    records = vapi_service.get_dispatch_records(10)
-    
-    if records:
-        for record in records[-3:]:  # Show last 3
-            print(f"  • {record['callsign']} ({record['emergency_type']}) - {record['call_status']}")
-    else:
-        print("  No dispatch records found")
+        # Check dispatch records
+        print("📊 Recent Dispatch Records:")
+        records = vapi_service.get_dispatch_records(10)
+        
+        if records:
+            for record in records[-3:]:  # Show last 3
+                print(f"  • {record['callsign']} ({record['emergency_type']}) - {record['call_status']}")
+        else:
+            print("  No dispatch records found")
     
     print("\n🔧 Configuration Files Check:")
     
@@ -124,6 +127,8 @@ def test_api_integration():
 
 if __name__ == "__main__":
     # Run tests
+    install_uvloop()
+    
     asyncio.run(test_dispatch_system())
     test_api_integration()
     
@@ -5,12 +5,40 @@ Shows how garbled Whisper transcripts get cleaned up into proper ATC communicati
 """
 import asyncio
 import os
+from types import MappingProxyType
 from dotenv import load_dotenv
 from src.atc_audio_agent.agents.atc_language_agent import ATCTranscriptProcessor
+from src.event_loop import install_uvloop
 
 # Load environment variables
 load_dotenv()
 
+# Garbled transcripts that need serious cleanup
+GARBLED_TRANSCRIPTS = (
+    "run made 23 clear land",
+    "united two nine seven heavy contact ground", 
+    "american twelve tree four taxi gate a twelve",
+    "line up and weight run way two eight left",
+    "take off cleared zero one right",
+    "emirates two two five heavy contact departure one two zero point niner",
+    "delta five six seven taxi via a hold short run way two eight right",
+    "singapore two taxi to international terminal",
+    "southwest one two tree four roger wilco",
+    "lufthansa four four one contact norcal departure good day"
+)
+
+# Pipeline payloads built once; read-only so the concurrent calls can share them
+_PAYLOADS = tuple(
+    MappingProxyType({
+        "text": transcript,
+        "frequency": "KSFO_TWR",
+        "timestamp": "2024-01-01T12:00:00Z",
+        "chunk": i+1,
+        "engine": "groq_whisper"
+    })
+    for i, transcript in enumerate(GARBLED_TRANSCRIPTS)
+)
+
 async def test_garbled_transcripts():
     """Test the formatter with intentionally garbled transcripts"""
     
@@ -21,39 +49,31 @@ async def test_garbled_transcripts():
     
     # Create the processor with the new pipeline
     processor = ATCTranscriptProcessor(groq_api_key)
+    await processor.warm_up()
     
     print("🎧 ATC PHRASEOLOGY FORMATTER TEST")
     print("Demonstrating cleanup of garbled Whisper transcripts")
     print("=" * 70)
     
-    # Garbled transcripts that need serious cleanup
-    garbled_transcripts = [
-        "run made 23 clear land",
-        "united two nine seven heavy contact ground", 
-        "american twelve tree four taxi gate a twelve",
-        "line up and weight run way two eight left",
-        "take off cleared zero one right",
-        "emirates two two five heavy contact departure one two zero point niner",
-        "delta five six seven taxi via a hold short run way two eight right",
-        "singapore two taxi to international terminal",
-        "southwest one two tree four roger wilco",
-        "lufthansa four four one contact norcal departure good day"
-    ]
+    # Process through the pipeline concurrently, at most 5 requests in flight
+    semaphore = asyncio.Semaphore(5)
+    
+    async def process(transcript_data):
+        async with semaphore:
+            return await processor.process_audio_transcript(transcript_data)
     
-    for i, transcript in enumerate(garbled_transcripts):
+    results = await asyncio.gather(
+        *(process(transcript_data) for transcript_data in _PAYLOADS),
+        return_exceptions=True
+    )
+    
+    for i, (transcript, result) in enumerate(zip(GARBLED_TRANSCRIPTS, results)):
         print(f"\n🎤 Test {i+1}: '{transcript}'")
         print("-" * 50)
         
-        # Process through the pipeline
-        transcript_data = {
-            "text": transcript,
-            "frequency": "KSFO_TWR", 
-            "timestamp": "2024-01-01T12:00:00Z",
-            "chunk": i+1,
-            "engine": "groq_whisper"
-        }
-        
-        result = await processor.process_audio_transcript(transcript_data)
+        if isinstance(result, Exception):
+            print(f"❌ Error: {result}")
+            continue
         
         # Show formatter results
         if "formatting" in result:
@@ -93,8 +113,11 @@ async def test_garbled_transcripts():
     print(f"   Transcripts Processed: {formatter_stats.get('processed_transcripts', 0)}")
     print(f"   Transcripts Cleaned:   {formatter_stats.get('cleaned_transcripts', 0)}")
     print(f"   Cleanup Rate:          {formatter_stats.get('cleanup_rate', 0):.0%}")
+    print(f"   Cache Hit Rate:        {stats.get('pipeline', {}).get('cache_hit_rate', 0):.0%}")
     
     print(f"\n✅ No more 'run made 23' nonsense - everything becomes proper ATC!")
 
 if __name__ == "__main__":
+    install_uvloop()
+    
     asyncio.run(test_garbled_transcripts()) 
\ No newline at end of file
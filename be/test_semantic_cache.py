@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Test the semantic transcript cache signatures
+Paraphrases must share a signature; clearances that differ in meaning must not
+"""
+from src.atc_audio_agent.agents.atc_language_agent import SemanticTranscriptCache
+
+# Same clearance, different wording - these may reuse each other's result
+PARAPHRASES = (
+    ("runway two three cleared to land", "runway 23 clear land"),
+    ("united two nine seven contact ground", "united 297 contact ground"),
+    ("climb and maintain flight level three five zero", "climb maintain flight level 350"),
+)
+
+# Similar wording, different meaning - these must never share a result
+DISTINCT = (
+    ("cross runway 28 left", "do not cross runway 28 left"),
+    ("hold short runway 28 left", "negative, hold short runway 28 left"),
+    ("climb and maintain two thousand", "climb and maintain two hundred"),
+    ("cross runway 28 left", "cross runway 28 right"),
+    ("taxi via alpha", "taxi via bravo"),
+    ("reduce speed to 180 knots", "reduce speed to 180"),
+    ("turn left heading 270", "unable turn left heading 270"),
+)
+
+
+def signature(cache: SemanticTranscriptCache, text: str) -> str:
+    return cache.signature(cache.canonicalize(text))
+
+
+def test_signatures():
+    """Check every pair against the signature the cache matches on"""
+    cache = SemanticTranscriptCache(callsign_words=("united", "american", "delta"))
+    failures = 0
+
+    print("🧪 Testing Semantic Cache Signatures")
+    print("=" * 50)
+
+    for first, second in PARAPHRASES:
+        same = signature(cache, first) == signature(cache, second)
+        print(f"{'✅' if same else '❌'} same:      '{first}' ~ '{second}'")
+        failures += not same
+
+    for first, second in DISTINCT:
+        same = signature(cache, first) == signature(cache, second)
+        print(f"{'❌' if same else '✅'} different: '{first}' / '{second}'")
+        failures += same
+
+    print(f"\n{'✅ All signatures correct' if not failures else f'❌ {failures} signature(s) wrong'}")
+    assert not failures
+
+
+if __name__ == "__main__":
+    test_signatures()
@@ -5,46 +5,53 @@ One-command setup for the entire project
 """
 import os
 import sys
+import shutil
 import subprocess
 from pathlib import Path
 
+def pip_install_command(venv_dir):
+    """Install into the venv with uv when it's on PATH (much faster resolver), else its own pip"""
+    bin_dir = venv_dir / ('Scripts' if os.name == 'nt' else 'bin')
+    if shutil.which('uv'):
+        python = bin_dir / ('python.exe' if os.name == 'nt' else 'python')
+        return ['uv', 'pip', 'install', '--python', str(python), '-r', 'requirements.txt']
+    return [str(bin_dir / 'pip'), 'install', '--prefer-binary', '-r', 'requirements.txt']
+
 def main():
     print("🎯 AI Berkeley 2025 - ATC Audio Agent Setup")
     print("=" * 50)
     
     # Check if .env exists
-    if not Path('.env').exists():
+    if not Path('.env').exists() and Path('.env.example').exists():
         print("📝 Creating .env file from template...")
-        subprocess.run(['cp', '.env.example', '.env'])
+        shutil.copyfile('.env.example', '.env')
         print("✅ .env file created!")
         print("🔑 Please edit .env file with your actual API keys")
+    elif not Path('.env').exists():
+        print("⚠️ No .env.example template found - create .env with your API keys")
     else:
         print("✅ .env file already exists")
     
     # Setup backend
     print("\n🐍 Setting up Python backend...")
-    os.chdir('be')
+    venv_dir = Path('be') / 'venv'
     
-    if not Path('venv').exists():
+    if not venv_dir.exists():
         print("📦 Creating Python virtual environment...")
-        subprocess.run([sys.executable, '-m', 'venv', 'venv'])
+        subprocess.run([sys.executable, '-m', 'venv', str(venv_dir)])
     
+    # Backend and frontend installs touch different directories, so run them side by side
     print("📦 Installing Python dependencies...")
-    if os.name == 'nt':  # Windows
-        subprocess.run(['venv\\Scripts\\pip', 'install', '-r', 'requirements.txt'])
-    else:  # Unix/Linux/macOS
-        subprocess.run(['venv/bin/pip', 'install', '-r', 'requirements.txt'])
-    
-    os.chdir('..')
+    pip = subprocess.Popen(pip_install_command(venv_dir.resolve()), cwd='be')
     
-    # Setup frontend
     print("\n⚛️ Setting up Node.js frontend...")
-    os.chdir('fe')
-    
     print("📦 Installing Node.js dependencies...")
-    subprocess.run(['npm', 'install'])
+    npm = subprocess.Popen(['npm', 'install'], cwd='fe')
     
-    os.chdir('..')
+    failed = [name for name, process in (("Python", pip), ("Node.js", npm)) if process.wait() != 0]
+    if failed:
+        print(f"\n❌ {' and '.join(failed)} dependency install failed - see the output above")
+        sys.exit(1)
     
     print("\n🎉 Setup complete!")
     print("\n🚀 To run the project:")